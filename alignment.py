@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Align the Syromorph NT (SyrNT) with the SEDRA NT (BFBS)
+
+Both texts are joined on location id, i.e. book (2 digits), chapter (2),
+verse (3) and word (2), e.g. 520100106, with sorted-array merges. Every
+difference is reported as a Discrepancy with one of the kinds:
+
+    only_syrnt  - location only found in SyrNT
+    only_bfbs   - location only found in BFBS
+    duplicate   - location found more than once in one text
+    cons_str    - different consonantal forms
+    lexeme      - different lexemes
+
+Forms and lexemes are compared in SEDRA transcription, e.g.:
+
+    a = Alignment(syrnt.SyrNT(), sedra.BFBS())
+    a.summary()                 # number of discrepancies by kind
+    a.write_json('diff.json')   # machine-readable report
+    table = a.merged()          # outer join: loc_id, syrnt_row, bfbs_row
+"""
+
+from __future__ import unicode_literals, print_function
+import json
+from collections import namedtuple, OrderedDict
+import numpy as np
+
+KINDS = ('only_syrnt', 'only_bfbs', 'duplicate', 'cons_str', 'lexeme')
+
+Discrepancy = namedtuple('Discrepancy', ['loc_id', 'kind', 'syrnt', 'bfbs'])
+
+
+def syrnt_loc_ids(text):
+    '''Get array of location ids of all words of a SyrNT text'''
+    offsets = np.asarray(text.verse_offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    labels = np.array([text.verse_label(i)[1:]
+                       for i in range(len(lengths))], dtype=np.int64)
+    verse_ids = (labels[:, 0] * 100 + labels[:, 1]) * 1000 + labels[:, 2]
+    w_num = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths) + 1
+    return np.repeat(verse_ids, lengths) * 100 + w_num
+
+def bfbs_strings(text, key):
+    '''Get list of cons_str or lex_str of the SEDRA words of all tokens'''
+    db = text.db.transcribed(None)
+    word_rows = np.asarray(db.words.rows)[text.columns['word_id']]
+    if key == 'cons_str':
+        values = np.array(db.words.column('cons_str'), dtype=object)
+        return values[word_rows]
+    lexemes = db.lexemes
+    lex_rows = np.asarray(lexemes.rows)[np.asarray(db.words.column('lex_addr'))]
+    lex_str = np.array(lexemes.column('lex_str') + [''], dtype=object)
+    return lex_str[lex_rows][word_rows]     # row -1 (no lexeme) gives ''
+
+def equal_strings(a, b):
+    '''Compare two arrays of strings element-wise, through shared codes'''
+    codes = np.unique(np.concatenate((a, b)).astype(np.str_),
+                      return_inverse=True)[1].ravel()
+    return codes[:len(a)] == codes[len(a):]
+
+def duplicates(loc_ids):
+    '''Get sorted array of location ids that occur more than once'''
+    s = np.sort(loc_ids)
+    return np.unique(s[1:][s[1:] == s[:-1]])
+
+
+class Alignment:
+    '''Token alignment of a SyrNT and a BFBS text, on location id'''
+
+    def __init__(self, syrnt, bfbs):
+        self.syrnt = syrnt.transcribed(None)
+        self.bfbs = bfbs
+        self.syrnt_loc_ids = syrnt_loc_ids(self.syrnt)
+        self.bfbs_loc_ids = np.asarray(bfbs.columns['loc_id'], dtype=np.int64)
+        # rows of tokens with the same location id in both texts
+        self.loc_ids, self.syrnt_rows, self.bfbs_rows = np.intersect1d(
+            self.syrnt_loc_ids, self.bfbs_loc_ids, return_indices=True)
+        self._discrepancies = None
+
+    def merged(self):
+        '''Get outer join of both texts, as dict of arrays: loc_id,
+        syrnt_row and bfbs_row, with row -1 where a text lacks the token'''
+        loc_ids = np.union1d(self.syrnt_loc_ids, self.bfbs_loc_ids)
+        result = OrderedDict([('loc_id', loc_ids)])
+        for key, column in (('syrnt_row', self.syrnt_loc_ids),
+                            ('bfbs_row', self.bfbs_loc_ids)):
+            order = np.argsort(column, kind='stable')
+            i = np.searchsorted(column, loc_ids, sorter=order)
+            i = np.minimum(i, len(column) - 1)
+            rows = order[i]
+            result[key] = np.where(column[rows] == loc_ids, rows, -1)
+        return result
+
+    def discrepancies(self):
+        '''Get list of all discrepancies, sorted by location id'''
+        if self._discrepancies is None:
+            self._discrepancies = self._find_discrepancies()
+        return self._discrepancies
+
+    def _find_discrepancies(self):
+        syrnt_ids, bfbs_ids = self.syrnt_loc_ids, self.bfbs_loc_ids
+        syrnt_forms = np.array(self.syrnt.column('cons_str'), dtype=object)
+        bfbs_forms = bfbs_strings(self.bfbs, 'cons_str')
+        found = []
+        for r in np.flatnonzero(~np.isin(syrnt_ids, bfbs_ids)).tolist():
+            found.append(Discrepancy(int(syrnt_ids[r]), 'only_syrnt',
+                                     syrnt_forms[r], None))
+        for r in np.flatnonzero(~np.isin(bfbs_ids, syrnt_ids)).tolist():
+            found.append(Discrepancy(int(bfbs_ids[r]), 'only_bfbs',
+                                     None, bfbs_forms[r]))
+        # for duplicates, the number of tokens in both texts is given
+        for loc_id in np.union1d(duplicates(syrnt_ids),
+                                 duplicates(bfbs_ids)).tolist():
+            found.append(Discrepancy(loc_id, 'duplicate',
+                                     int(np.count_nonzero(syrnt_ids == loc_id)),
+                                     int(np.count_nonzero(bfbs_ids == loc_id))))
+        syrnt_lexemes = np.array(self.syrnt.column('lexeme'), dtype=object)
+        bfbs_lexemes = bfbs_strings(self.bfbs, 'lexeme')
+        for kind, a, b in (('cons_str', syrnt_forms, bfbs_forms),
+                           ('lexeme', syrnt_lexemes, bfbs_lexemes)):
+            a, b = a[self.syrnt_rows], b[self.bfbs_rows]
+            for i in np.flatnonzero(~equal_strings(a, b)).tolist():
+                found.append(Discrepancy(int(self.loc_ids[i]), kind,
+                                         a[i], b[i]))
+        found.sort(key=lambda d: (d.loc_id, KINDS.index(d.kind)))
+        return found
+
+    def summary(self):
+        '''Get dict of number of discrepancies by kind'''
+        result = OrderedDict((kind, 0) for kind in KINDS)
+        for d in self.discrepancies():
+            result[d.kind] += 1
+        return result
+
+    def report(self):
+        '''Get machine-readable report, as dict'''
+        return OrderedDict([
+            ('syrnt_tokens', len(self.syrnt_loc_ids)),
+            ('bfbs_tokens', len(self.bfbs_loc_ids)),
+            ('aligned_tokens', len(self.loc_ids)),
+            ('summary', self.summary()),
+            ('discrepancies', [OrderedDict(zip(Discrepancy._fields, d))
+                               for d in self.discrepancies()])])
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.report(), indent=1, ensure_ascii=False))
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark loading, iteration and morphological analysis
+
+Usage: python benchmark.py [options] [benchmark ...]
+
+Every benchmark runs in a fresh process. It is timed (best of --repeat
+runs), and run once more with tracemalloc to get the peak of memory
+allocated by Python. The peak RSS of the process is recorded as well.
+Results are compared with a JSON baseline, if present, and a result
+that is slower or larger than the baseline by more than --threshold
+(a fraction, default 0.2) is reported as a regression, in which case
+the exit status is 1.
+
+Since the Syromorph file (all-ordered.txt) is not shipped, SyrNT and
+MorphAn are benchmarked on a synthetic file in the same format, built
+from the SEDRA data with random annotations (fixed seed), unless
+--syromorph gives a real file.
+
+Options:
+  --baseline FILE    baseline file (default: benchmark-baseline.json)
+  --save             store the results as new baseline
+  --threshold X      allowed increase of time and memory (default: 0.2)
+  --repeat N         number of timed runs (default: 3)
+  --words N          number of words analyzed and tested (default: 200)
+  --syromorph FILE   Syromorph file to use instead of a synthetic one
+  --list             list benchmarks
+"""
+
+from __future__ import unicode_literals, print_function
+import os
+import sys
+import json
+import time
+import random
+import platform
+import tempfile
+import tracemalloc
+from collections import OrderedDict
+
+import sedra
+import syrnt
+import morphan
+from constants import SyrNT as c
+
+BASELINE = 'benchmark-baseline.json'
+
+
+def write_syromorph(path, seed=1):
+    '''Write synthetic Syromorph file, with the words of the BFBS text'''
+    rnd = random.Random(seed)
+    nt = sedra.BFBS(tr=None, shared=False)
+    verses = dict(nt.verses(label=True))
+    lines = []
+    for label in syrnt.get_verse_labels():
+        words = []
+        for w in verses.get(label, ()):
+            # spaces separate words, so are removed from all strings
+            cons = w.cons_str.replace(' ', '')
+            lexeme = w.lexeme.lex_str.replace(' ', '') if w.lexeme else cons
+            root = w.root.rt_str.replace(' ', '') if w.root else ''
+            prefix = 'D' if (cons.startswith('D') and len(cons) > 2
+                             and rnd.random() < .5) else ''
+            fields = [cons[len(prefix):], lexeme, root, prefix, '', '0']
+            fields.extend(str(rnd.randrange(len(labels)))
+                          for name, labels in c.ANNOTATIONS[6:])
+            words.append('{0}|{1}'.format(cons, '#'.join(fields)))
+        lines.append(' '.join(words))
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+class Environment:
+    '''Data shared by the benchmarks in one process'''
+
+    def __init__(self, syromorph, words):
+        self.syromorph = syromorph
+        self.words = words
+        self._syrnt = None
+        self._morphan = None
+
+    @property
+    def syrnt(self):
+        if self._syrnt is None:
+            self._syrnt = syrnt.SyrNT(path=self.syromorph)
+        return self._syrnt
+
+    def split(self):
+        '''Get training corpus and test words'''
+        words = list(self.syrnt.words())
+        return words[:-self.words], words[-self.words:]
+
+    @property
+    def morphan(self):
+        if self._morphan is None:
+            self._morphan = morphan.MorphAn()
+            self._morphan.train(self.split()[0])
+        return self._morphan
+
+
+# Every benchmark gets the environment, does its setup, and returns a
+# function to be measured, and the number of items it handles (or None)
+
+def sedra_load(env):
+    return lambda: sedra.SedraIII(cache=False, workers=1), None
+
+def sedra_load_cached(env):
+    sedra.SedraIII()    # make sure the snapshots exist
+    return lambda: sedra.SedraIII(), None
+
+def bfbs_load(env):
+    return lambda: sedra.BFBS(cache=False, shared=False), None
+
+def bfbs_load_cached(env):
+    sedra.BFBS(shared=False)
+    return lambda: sedra.BFBS(shared=False), None
+
+def syrnt_load(env):
+    return lambda: syrnt.SyrNT(path=env.syromorph), None
+
+def bfbs_verses(env):
+    nt = sedra.BFBS()
+    def run():
+        for v in nt.verses():
+            for w in v:
+                w.cons_str
+    return run, len(nt)
+
+def bfbs_printlines(env):
+    nt = sedra.BFBS()
+    return lambda: list(nt.printlines()), len(nt)
+
+def syrnt_verses(env):
+    nt = env.syrnt
+    def run():
+        for v in nt.verses():
+            for w in v:
+                w.cons_str
+    return run, len(nt)
+
+def syrnt_stream(env):
+    def run():
+        nt = syrnt.SyrNT(path=env.syromorph, stream=True)
+        for s in nt.tag_sentences():
+            pass
+    # count the words without loading the text, which would add to the RSS
+    with open(env.syromorph) as f:
+        words = sum(len(line.split()) for line in f)
+    return run, words
+
+def syrnt_printlines(env):
+    nt = env.syrnt
+    return lambda: list(nt.printlines()), len(nt)
+
+def morphan_train(env):
+    train = env.split()[0]
+    return lambda: morphan.MorphAn().train(train), len(train)
+
+def morphan_analyze(env):
+    m = env.morphan
+    words = [w.cons_str for w in env.split()[1]]
+    def run():
+        for w in words:
+            m.analyze(w)
+    return run, len(words)
+
+def morphan_test(env):
+    m = env.morphan
+    words = env.split()[1]
+    def run():
+        # test() prints its progress
+        from contextlib import redirect_stdout
+        from io import StringIO
+        with redirect_stdout(StringIO()):
+            m.test(words)
+    return run, len(words)
+
+BENCHMARKS = OrderedDict((f.__name__, f) for f in (
+    sedra_load, sedra_load_cached, bfbs_load, bfbs_load_cached, syrnt_load,
+    bfbs_verses, bfbs_printlines, syrnt_verses, syrnt_stream, syrnt_printlines,
+    morphan_train, morphan_analyze, morphan_test))
+
+
+def peak_rss():
+    '''Get peak resident set size of this process in bytes, or None'''
+    try:
+        import resource
+    except ImportError:
+        return None     # not available on Windows
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, and in kilobytes elsewhere
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def measure(name, syromorph, words, repeat):
+    '''Run benchmark name in this process, and get its result'''
+    run, items = BENCHMARKS[name](Environment(syromorph, words))
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    run()
+    allocated = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    result = OrderedDict([('time', min(times)),
+                          ('tracemalloc_peak', allocated),
+                          ('peak_rss', peak_rss())])
+    if items:
+        result['items'] = items
+        result['items_per_second'] = items / min(times)
+    return result
+
+def _child(conn, name, syromorph, words, repeat):
+    try:
+        conn.send(measure(name, syromorph, words, repeat))
+    except Exception as e:
+        conn.send({'error': '{0}: {1}'.format(e.__class__.__name__, e)})
+    conn.close()
+
+def run_isolated(name, syromorph, words, repeat):
+    '''Run benchmark name in a fresh process, and get its result'''
+    import multiprocessing
+    ctx = multiprocessing.get_context('spawn')
+    parent, child = ctx.Pipe()
+    p = ctx.Process(target=_child, args=(child, name, syromorph, words, repeat))
+    p.start()
+    result = parent.recv()
+    p.join()
+    return result
+
+def compare(results, baseline, threshold):
+    '''Get list of (name, measure, baseline value, value) of regressions'''
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or 'error' in result or 'error' in base:
+            continue
+        for key in ('time', 'tracemalloc_peak', 'peak_rss'):
+            old, new = base.get(key), result.get(key)
+            if old and new and new > old * (1 + threshold):
+                regressions.append((name, key, old, new))
+    return regressions
+
+def main(args):
+    options = {'--baseline': BASELINE, '--threshold': '0.2',
+               '--repeat': '3', '--words': '200', '--syromorph': None}
+    names, save = [], False
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg in options:
+            options[arg] = args.pop(0)
+        elif arg == '--save':
+            save = True
+        elif arg == '--list':
+            print('\n'.join(BENCHMARKS))
+            return 0
+        elif arg in BENCHMARKS:
+            names.append(arg)
+        else:
+            print(__doc__)
+            return 2
+    names = names or list(BENCHMARKS)
+
+    syromorph = options['--syromorph']
+    tmp_dir = None
+    if syromorph is None:
+        tmp_dir = tempfile.mkdtemp()
+        syromorph = os.path.join(tmp_dir, 'all-ordered.txt')
+        write_syromorph(syromorph)
+
+    results = OrderedDict()
+    try:
+        for name in names:
+            results[name] = r = run_isolated(name, syromorph,
+                int(options['--words']), int(options['--repeat']))
+            if 'error' in r:
+                print('{0:20} {1}'.format(name, r['error']))
+            else:
+                print('{0:20} {1:9.3f} s {2:8.1f} MB alloc {3:8.1f} MB rss{4}'
+                      .format(name, r['time'], r['tracemalloc_peak'] / 1e6,
+                              (r['peak_rss'] or 0) / 1e6,
+                              '  {0:10.0f} items/s'.format(
+                                  r['items_per_second']) if 'items' in r else ''))
+    finally:
+        if tmp_dir is not None:
+            os.remove(syromorph)
+            os.rmdir(tmp_dir)
+
+    status = 0
+    path = options['--baseline']
+    if os.path.exists(path):
+        with open(path) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, float(options['--threshold']))
+        for name, key, old, new in regressions:
+            print('REGRESSION {0} {1}: {2:.4g} -> {3:.4g} (+{4:.0%})'.format(
+                name, key, old, new, new / old - 1))
+        status = 1 if regressions else 0
+    if save:
+        with open(path, 'w') as f:
+            json.dump(OrderedDict([
+                ('python', platform.python_version()),
+                ('platform', platform.platform()),
+                ('date', time.strftime('%Y-%m-%d %H:%M:%S')),
+                ('results', results)]), f, indent=1)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
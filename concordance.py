@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Concordance of the New Testament by lexeme, root and word form
+
+A Concordance is an inverted index on a BFBS or SyrNT text: for every
+lexeme, root, consonantal form (cons_str) and vocalized form (voc_str,
+BFBS only), it holds the positions of its tokens in a compact integer
+array. Other fields can be indexed as well: the Syromorph annotation
+fields of SyrNT, and the SEDRA word features and attributes of BFBS.
+The index of a field is built on first use, in one pass over the text.
+kwic() generates keyword-in-context lines from the index, e.g.:
+
+    conc = Concordance(sedra.BFBS())
+    for line in conc.kwic('lexeme', 'MLK>', width=4, sort='right'):
+        print(line.reference, ' '.join(line.left), '|', line.keyword,
+              '|', ' '.join(line.right))
+
+The lexemes and roots of BFBS are indexed by SEDRA record, since
+different records may have the same string, e.g. >B>. A string given
+as value stands for all records with that string.
+"""
+
+from __future__ import unicode_literals, print_function
+from collections import namedtuple
+import numpy as np
+
+FIELDS = ('lexeme', 'root', 'cons_str', 'voc_str')
+SORT_ORDERS = ('position', 'left', 'right', 'keyword')
+
+Line = namedtuple('Line', ['position', 'reference', 'left', 'keyword', 'right'])
+
+
+def make_postings(values):
+    '''Get dict of arrays of positions by value, skipping None'''
+    postings = {}
+    for position, value in enumerate(values):
+        if value is None:
+            continue
+        try:
+            postings[value].append(position)
+        except KeyError:
+            postings[value] = [position]
+    return dict((value, np.array(positions, dtype=np.int32))
+                for value, positions in postings.items())
+
+def bfbs_column(text, field):
+    '''Get list of values of field for all tokens of a BFBS text'''
+    db = text.db
+    word_rows = np.asarray(db.words.rows)[text.columns['word_id']].tolist()
+    if field in ('cons_str', 'voc_str'):
+        values = db.words.column(field)
+    elif field not in FIELDS:
+        # a field of the decoded features or attributes of a word
+        prop = 'features' if field in db.words.record_class.Features._fields \
+            else 'attributes'
+        values = [getattr(getattr(w, prop), field) for w in db.words]
+    else:
+        # resolve the lexeme (and root) record of every word once
+        lexemes = db.lexemes
+        lex_rows = [lexemes.rows[i] if i else None
+                    for i in db.words.column('lex_addr')]
+        if field == 'lexeme':
+            records = lexemes[:]
+            values = [records[r] if r is not None else None for r in lex_rows]
+        else:
+            roots = db.roots
+            records = roots[:]
+            root_addr = lexemes.column('root_addr')
+            values = [records[roots.rows[root_addr[r]]]
+                      if r is not None and root_addr[r] else None
+                      for r in lex_rows]
+    return [values[r] for r in word_rows]
+
+def get_fields(text):
+    '''Get names of all fields of the tokens of a text that can be indexed'''
+    if hasattr(text, 'db'):     # BFBS
+        word_class = text.db.words.record_class
+        return FIELDS + word_class.Features._fields + \
+            word_class.Attributes._fields
+    from syrnt import NTWord
+    return ('cons_str',) + NTWord.Annotation._fields
+
+def get_column(text, field):
+    '''Get list of values of field for all tokens of a text'''
+    if field not in get_fields(text):
+        raise KeyError('Unknown field for {0}: {1}'.format(
+            text.__class__.__name__, field))
+    if hasattr(text, 'db'):
+        return bfbs_column(text, field)
+    values = text.column(field)
+    if field in FIELDS:
+        # SyrNT annotations have empty strings instead of None
+        return [v or None for v in values]
+    return values
+
+
+class Concordance:
+    '''Inverted index of a BFBS or SyrNT text'''
+
+    def __init__(self, text):
+        self.text = text
+        self._postings = {}
+        self._records = {}  # field: dict of lists of records by string
+        self._forms = None
+        # fields indexed by record instead of string
+        self.record_fields = ('lexeme', 'root') if hasattr(text, 'db') else ()
+
+    def index(self, field):
+        '''Get dict of arrays of token positions by value of field'''
+        try:
+            return self._postings[field]
+        except KeyError:
+            postings = make_postings(get_column(self.text, field))
+            self._postings[field] = postings
+            return postings
+
+    def postings(self, field, value):
+        '''Get array of positions of all tokens where field == value'''
+        index = self.index(field)
+        if field in self.record_fields and not hasattr(value, '_table'):
+            # a string, for all records with that string
+            arrays = [index[r] for r in self.records(field, value)]
+            if len(arrays) != 1:
+                return np.sort(np.concatenate(
+                    arrays + [np.array([], dtype=np.int32)]))
+            return arrays[0]
+        return index.get(value, np.array([], dtype=np.int32))
+
+    def records(self, field, value):
+        '''Get list of the records of lexeme or root field with string
+        value (BFBS only)'''
+        try:
+            strings = self._records[field]
+        except KeyError:
+            strings = self._records[field] = {}
+            for r in self.headwords(field):
+                strings.setdefault(str(r), []).append(r)
+        return strings.get(value, [])
+
+    def sort_key(self, field):
+        '''Get function giving the sort key of a value of field'''
+        if field in self.record_fields:
+            return lambda r: (str(r), r.id)
+        return lambda v: v
+
+    def count(self, field, value):
+        return len(self.postings(field, value))
+
+    def headwords(self, field):
+        '''Get sorted list of all values of field'''
+        return sorted(self.index(field), key=self.sort_key(field))
+
+    def frequencies(self, field):
+        '''Get list of (value, count), most frequent first'''
+        key = self.sort_key(field)
+        return sorted(((v, len(p)) for v, p in self.index(field).items()),
+                      key=lambda e: (-e[1], key(e[0])))
+
+    @property
+    def forms(self):
+        '''Consonantal forms of all tokens, for the contexts'''
+        if self._forms is None:
+            self._forms = get_column(self.text, 'cons_str')
+        return self._forms
+
+    def kwic(self, field, value=None, width=5, sort='position'):
+        '''Generate keyword-in-context lines
+
+        Lines are generated for the tokens where field == value, or for
+        all values of field, by sorted headword. The context consists of
+        at most width words before and after the keyword in the same
+        verse. Lines of a headword are sorted by sort, which is one of
+        'position' (text order), 'left' (by the words before, from the
+        nearest), 'right' (by the words after) or 'keyword' (by the form
+        of the keyword, then text order).
+        '''
+        if sort not in SORT_ORDERS:
+            raise ValueError('Unknown sort order: {0}'.format(sort))
+        values = self.headwords(field) if value is None else [value]
+        offsets = np.asarray(self.text.verse_offsets)
+        forms = self.forms
+        for v in values:
+            positions = self.postings(field, v)
+            verses = np.searchsorted(offsets, positions, side='right') - 1
+            lines = []
+            for p, i in zip(positions.tolist(), verses.tolist()):
+                start = max(p - width, int(offsets[i]))
+                stop = min(p + width + 1, int(offsets[i+1]))
+                lines.append(Line(p, self.reference(i),
+                                  tuple(forms[start:p]), forms[p],
+                                  tuple(forms[p+1:stop])))
+            if sort == 'left':
+                lines.sort(key=lambda l: (l.left[::-1], l.position))
+            elif sort == 'right':
+                lines.sort(key=lambda l: (l.right, l.position))
+            elif sort == 'keyword':
+                lines.sort(key=lambda l: (l.keyword, l.position))
+            for line in lines:
+                yield line
+
+    def reference(self, i):
+        '''Get reference string of verse i, e.g. John 3:16'''
+        book_name, book_id, chapter, verse = self.text.verse_label(i)
+        return '{0} {1}:{2}'.format(book_name, chapter, verse)
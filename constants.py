@@ -4,6 +4,8 @@
 # General New Testament constants
 #====================================================================
 
+NT_OFFSET = 52  # starting id of NT books
+
 NT_BOOKS = (
     ('Matt',   (25, 23, 17, 25, 48, 34, 29, 34, 38, 42, 30, 50, 58, 36,
                 39, 28, 27, 35, 30, 34, 46, 46, 39, 51, 46, 75, 66, 20)),
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Integer-encoded tagged sentences, for training taggers
+
+An Encoder turns the sentences of SyrNT.tag_sentences() into NumPy
+arrays of ids, using vocabularies of forms, characters and tags. The
+arrays are made once, and can be cached on disk, so that every epoch
+only iterates over batches of arrays:
+
+    enc = Encoder(tag=syrnt.supertag)
+    data = enc.encode(nt, cache='train.npz')
+    for epoch in range(10):
+        for batch in data.batches(32, shuffle=True, seed=epoch):
+            batch.tokens, batch.tags, batch.lengths  # (32, max length)
+    enc.freeze()                    # unknown strings get id UNK
+    test = enc.encode(test_sentences)
+
+Batches are padded with PAD (default), or ragged with padded=False, in
+which case tokens and tags hold the tokens of all sentences after each
+other, and lengths the number of tokens of every sentence. With
+chars=True, batches also have the character ids of every token.
+
+The text is a SyrNT text, a view on one (split into verses), or any
+iterable of sentences of words, e.g. a list of views.
+
+Id 0 (PAD) and 1 (UNK) are reserved in all vocabularies. Tags must be
+strings, as given by syrnt.postag and syrnt.supertag.
+A cache is rebuilt if the tag function (by module and qualified name),
+the frozen vocabularies or the fingerprint of the input differ. Tags of
+lambdas and local functions cannot be cached, since their names do not
+identify them. The fingerprint holds the file, its
+modification time and the transcription of a text, with the row numbers
+of views, or else the forms of the sentences (see fingerprint()).
+"""
+
+from __future__ import unicode_literals, print_function
+import os
+from array import array
+from hashlib import sha1
+from collections import namedtuple
+import numpy as np
+
+import syrnt
+
+FORMAT_VERSION = '2'
+
+PAD, UNK = 0, 1
+RESERVED = ('<pad>', '<unk>')
+
+Batch = namedtuple('Batch', ['sentences', 'tokens', 'tags', 'lengths',
+                             'chars', 'char_lengths'])
+
+
+class Vocabulary(object):
+    '''Ids of strings, with PAD and UNK reserved'''
+
+    def __init__(self, strings=(), frozen=False):
+        self.strings = list(RESERVED)
+        self.index = dict((s, i) for i, s in enumerate(self.strings))
+        self.frozen = False
+        for s in strings:
+            self.add(s)
+        self.frozen = frozen
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __contains__(self, s):
+        return s in self.index
+
+    def __eq__(self, other):
+        return isinstance(other, Vocabulary) and self.strings == other.strings
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __getitem__(self, s):
+        '''Get id of string s, or UNK'''
+        return self.index.get(s, UNK)
+
+    def add(self, s):
+        '''Get id of string s, adding it unless frozen'''
+        try:
+            return self.index[s]
+        except KeyError:
+            if self.frozen:
+                return UNK
+            i = self.index[s] = len(self.strings)
+            self.strings.append(s)
+            return i
+
+    def freeze(self):
+        self.frozen = True
+        return self
+
+    def encode(self, strings):
+        '''Get array of ids of strings, adding new ones unless frozen'''
+        return np.array([self.add(s) for s in strings], dtype=np.int32)
+
+    def decode(self, ids):
+        '''Get list of strings of ids'''
+        strings = self.strings
+        return [strings[i] for i in np.asarray(ids).tolist()]
+
+    def to_array(self):
+        return np.array(self.strings, dtype=np.str_)
+
+    @classmethod
+    def from_array(cls, a, frozen=False):
+        strings = a.tolist()
+        if tuple(strings[:len(RESERVED)]) != RESERVED:
+            raise ValueError('Not a vocabulary array')
+        return cls(strings[len(RESERVED):], frozen)
+
+
+def tag_name(tag):
+    '''Get module.qualname of tag function, which identifies its tags'''
+    return '{0}.{1}'.format(getattr(tag, '__module__', None),
+                            getattr(tag, '__qualname__', repr(tag)))
+
+def is_named(tag):
+    '''Test if tag function is identified by its name, i.e. is not a
+    lambda, a local function or another callable'''
+    name = getattr(tag, '__qualname__', None)
+    return (name is not None and getattr(tag, '__module__', None) is not None
+            and '<' not in name)   # <lambda> and <locals>
+
+def text_id(text):
+    '''Get string identifying the data of a SyrNT text, or None'''
+    source = getattr(text, '_source', None)
+    if source is not None:
+        path = getattr(source, 'path', None)    # sqlitedb or npzbundle
+    else:
+        path = getattr(text, '_path', None)
+    if path is None or not os.path.exists(path):
+        return None     # e.g. a verse read by SyrNT.stream_verses()
+    st = os.stat(path)
+    tr = text._tr
+    return '{0} {1} {2} {3}'.format(os.path.abspath(path), st.st_mtime_ns,
+        st.st_size, sorted(tr.items()) if tr is not None else None)
+
+def fingerprint(text):
+    '''Get hex digest identifying the sentences of text, see Encoder'''
+    h = sha1()
+    key = text_id(text) if isinstance(text, syrnt.SyrNT) else None
+    if key is not None:
+        h.update(key.encode('utf-8'))
+        return h.hexdigest()
+    for sentence in text:
+        key = (text_id(sentence.text) if isinstance(sentence, syrnt.Words)
+               else None)
+        if key is not None:
+            # row numbers of the view
+            h.update(key.encode('utf-8'))
+            for p in sentence.rows.parts:
+                if isinstance(p, range):
+                    h.update('{0}:{1}:{2}'.format(p.start, p.stop,
+                                                  p.step).encode('utf-8'))
+                else:
+                    h.update(np.asarray(p, dtype=np.int64).tobytes())
+        else:
+            h.update(' '.join(w.cons_str for w in sentence).encode('utf-8'))
+        h.update(b'\n')
+    return h.hexdigest()
+
+def gather(offsets, sentences, lengths):
+    '''Get array of positions of the items of the selected sentences,
+    given the offsets of the first item of every sentence'''
+    starts = np.asarray(offsets)[sentences]
+    before = np.cumsum(lengths) - lengths   # items of previous sentences
+    return (np.repeat(starts - before, lengths) +
+            np.arange(int(np.sum(lengths)), dtype=np.int64))
+
+def pad(flat, lengths, value=PAD):
+    '''Get 2-D array of items of flat, with lengths[i] items in row i'''
+    lengths = np.asarray(lengths)
+    width = int(lengths.max()) if len(lengths) else 0
+    result = np.full((len(lengths), width) + flat.shape[1:], value,
+                     dtype=flat.dtype)
+    result[np.arange(width) < lengths[:, None]] = flat
+    return result
+
+
+class Encoder(object):
+    '''Encode tagged sentences with vocabularies of forms, characters
+    and tags, which are built while encoding unless frozen or given'''
+
+    def __init__(self, tag=syrnt.postag, forms=None, chars=None, tags=None):
+        self.tag = tag
+        self.forms = Vocabulary() if forms is None else forms
+        self.chars = Vocabulary() if chars is None else chars
+        self.tags = Vocabulary() if tags is None else tags
+
+    def freeze(self):
+        '''Freeze all vocabularies, so that new strings get id UNK'''
+        for v in (self.forms, self.chars, self.tags):
+            v.freeze()
+        return self
+
+    def sentences(self, text):
+        '''Get tagged sentences of text, or of an iterable of sentences'''
+        if hasattr(text, 'tag_sentences'):
+            return text.tag_sentences(self.tag)
+        if isinstance(text, syrnt.Words):
+            text = text.verses()
+        tag = self.tag
+        return ([(w.cons_str, tag(w)) for w in s] for s in text)
+
+    def encode(self, text, cache=None):
+        '''Get Encoded data of the tagged sentences of text
+
+        The text is a SyrNT text (possibly streaming), a view on one,
+        which is split into verses, or any iterable of sentences of
+        words, e.g. a list of views. With cache, the data are loaded
+        from that file if it was made from the same input, and stored
+        in it otherwise.
+        '''
+        key = None
+        if cache is not None:
+            if not is_named(self.tag):
+                raise ValueError('Cannot cache the tags of {0}, use a '
+                                 'module-level function'.format(self.tag))
+            if isinstance(text, syrnt.Words):
+                text = text.verses()
+            elif not hasattr(text, 'tag_sentences'):
+                text = list(text)   # iterated twice
+            key = fingerprint(text)
+            try:
+                data = Encoded.load(cache)
+            except (IOError, ValueError, KeyError):
+                data = None     # missing, or in an older format
+            if data is not None and self._adopt(data, key):
+                return data
+        data = self._encode(self.sentences(text))
+        data.fingerprint = key
+        if cache is not None:
+            data.save(cache)
+        return data
+
+    def _adopt(self, data, key):
+        '''Use vocabularies of cached data, if it fits this encoder'''
+        if data.tag_name != tag_name(self.tag) or data.fingerprint != key:
+            return False
+        for name in ('forms', 'chars', 'tags'):
+            mine, theirs = getattr(self, name), getattr(data, name)
+            if (mine.frozen or len(mine) > len(RESERVED)) and mine != theirs:
+                return False
+        for name in ('forms', 'chars', 'tags'):
+            theirs = getattr(data, name)
+            theirs.frozen = getattr(self, name).frozen
+            setattr(self, name, theirs)
+        return True
+
+    def _encode(self, sentences):
+        tokens, tags, lengths = array('i'), array('i'), array('i')
+        chars, char_lengths = array('i'), array('i')
+        add_form, add_tag = self.forms.add, self.tags.add
+        spelled = {}    # character ids of every distinct form
+        for sentence in sentences:
+            for form, tag in sentence:
+                tokens.append(add_form(form))
+                tags.append(add_tag(tag))
+                try:
+                    c = spelled[form]
+                except KeyError:
+                    c = spelled[form] = [self.chars.add(ch) for ch in form]
+                chars.extend(c)
+                char_lengths.append(len(c))
+            lengths.append(len(sentence))
+        columns = [np.frombuffer(a, dtype=np.int32) if len(a) else
+                   np.zeros(0, dtype=np.int32)
+                   for a in (tokens, tags, lengths, chars, char_lengths)]
+        return Encoded(*columns, vocabularies=(self.forms, self.chars,
+                                               self.tags),
+                       tag_name=tag_name(self.tag))
+
+
+class Encoded(object):
+    '''Arrays of ids of tagged sentences, see Encoder'''
+
+    def __init__(self, tokens, tag_ids, lengths, char_ids, char_lengths,
+                 vocabularies, tag_name, fingerprint=None):
+        self.tokens = tokens            # form id of every token
+        self.tag_ids = tag_ids          # tag id of every token
+        self.lengths = lengths          # number of tokens of every sentence
+        self.char_ids = char_ids        # character ids of all tokens
+        self.char_lengths = char_lengths    # number of characters per token
+        self.forms, self.chars, self.tags = vocabularies
+        self.tag_name = tag_name
+        self.fingerprint = fingerprint  # of the input, see Encoder.encode()
+        # offsets of the first token of every sentence, and of the end
+        self.offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+        self.char_offsets = np.concatenate(
+            ([0], np.cumsum(char_lengths, dtype=np.int64)))
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def sentence(self, i):
+        '''Get (token ids, tag ids) of sentence i'''
+        start, stop = self.offsets[i], self.offsets[i+1]
+        return self.tokens[start:stop], self.tag_ids[start:stop]
+
+    def batch(self, sentences, padded=True, chars=False):
+        '''Get Batch of the sentences with the given numbers'''
+        sentences = np.asarray(sentences, dtype=np.int64)
+        lengths = self.lengths[sentences]
+        rows = gather(self.offsets, sentences, lengths)
+        tokens, tags = self.tokens[rows], self.tag_ids[rows]
+        char_ids = char_lengths = None
+        if chars:
+            char_lengths = self.char_lengths[rows]
+            char_ids = self.char_ids[gather(self.char_offsets, rows,
+                                            char_lengths)]
+        if padded:
+            tokens, tags = pad(tokens, lengths), pad(tags, lengths)
+            if chars:
+                char_ids = pad(pad(char_ids, char_lengths), lengths)
+                char_lengths = pad(char_lengths, lengths, 0)
+        return Batch(sentences, tokens, tags, lengths, char_ids, char_lengths)
+
+    def batches(self, size, padded=True, chars=False, shuffle=False,
+                seed=None, drop_last=False):
+        '''Yield Batches of size sentences, in order or shuffled'''
+        order = np.arange(len(self))
+        if shuffle:
+            np.random.RandomState(seed).shuffle(order)
+        stop = len(order) - len(order) % size if drop_last else len(order)
+        for start in range(0, stop, size):
+            yield self.batch(order[start:start+size], padded, chars)
+
+    def save(self, path):
+        '''Write arrays and vocabularies to .npz file at path'''
+        tmp_path = '{0}.{1}.tmp.npz'.format(path, os.getpid())
+        np.savez(tmp_path, version=np.array(FORMAT_VERSION),
+                 tag_name=np.array(self.tag_name),
+                 fingerprint=np.array(self.fingerprint or ''),
+                 tokens=self.tokens, tags=self.tag_ids, lengths=self.lengths,
+                 chars=self.char_ids, char_lengths=self.char_lengths,
+                 forms_vocabulary=self.forms.to_array(),
+                 chars_vocabulary=self.chars.to_array(),
+                 tags_vocabulary=self.tags.to_array())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        '''Read Encoded data from .npz file at path, memory-mapped'''
+        from npzbundle import mmap_npz
+        a = mmap_npz(path)
+        if str(a['version']) != FORMAT_VERSION:
+            raise ValueError('Unknown format of {0}'.format(path))
+        vocabularies = tuple(Vocabulary.from_array(a[name + '_vocabulary'])
+                             for name in ('forms', 'chars', 'tags'))
+        return cls(a['tokens'], a['tags'], a['lengths'], a['chars'],
+                   a['char_lengths'], vocabularies, str(a['tag_name']),
+                   str(a['fingerprint']) or None)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Opt-in counters and timers for the loaders and the analyzer
+
+Instrumentation is disabled by default. Instrumented code only checks
+the module attribute `enabled` before doing anything, so it costs next
+to nothing when disabled:
+
+    import instrument
+    instrument.enable()
+    db = sedra.SedraIII(cache=False)
+    instrument.stats()          # dict of counters, see below
+    print(instrument.prometheus())
+
+Every counter has a name and optional labels, e.g. the file name. A
+counter ending in '_seconds' holds the total time spent, and usually
+comes with a counter ending in '_total' with the number of calls or
+items. stats() gives a dict by counter name, with the value of
+unlabeled counters, and otherwise a dict by labels ('file=words').
+
+Counters:
+    sedra_parse_seconds{file}       parsing a SEDRA text file
+    sedra_parse_phase_seconds       parsing all SEDRA files (SedraIII)
+    sedra_records_total{file}       records loaded from a SEDRA file
+    sedra_link_seconds{file}        building table and indexes of a file
+    sedra_resolve_seconds{file}     resolving record addresses (get())
+    sedra_resolve_total{file}
+    sedra_decode_seconds            decoding bit fields (get_values())
+    sedra_decode_total
+    bfbs_parse_seconds              parsing the BFBS text file
+    bfbs_sort_seconds               sorting it by location id
+    bfbs_tokens_total
+    morphan_analyze_seconds         MorphAn.analyze()
+    morphan_analyze_total
+    morphan_affix_splits_total      (prefix, stem, suffix) splits tried
+    morphan_patterns_tested_total   calls of test_pattern()
+    morphan_candidates_total        stems matching a pattern
+    morphan_probabilities_total     calls of MorphAn.getprb()
+
+Files parsed in worker processes (see SedraIII) are not counted in
+sedra_parse_seconds, but the whole parse phase is, in
+sedra_parse_phase_seconds.
+"""
+
+from __future__ import unicode_literals, print_function
+import threading
+import time
+from collections import OrderedDict
+
+enabled = False
+
+_counters = OrderedDict()    # (name, labels) -> value
+_lock = threading.Lock()
+
+clock = time.perf_counter
+
+
+def enable(on=True):
+    '''Start (or with on=False, stop) counting'''
+    global enabled
+    enabled = bool(on)
+
+def disable():
+    enable(False)
+
+def reset():
+    '''Set all counters to zero, by removing them'''
+    with _lock:
+        _counters.clear()
+
+def add(name, value=1, **labels):
+    '''Add value to counter name with labels, if enabled'''
+    if not enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+class timer(object):
+    '''Context manager adding the time spent to counter name'''
+
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        if enabled:
+            self.start = clock()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            add(self.name, clock() - self.start, **self.labels)
+
+
+def label_str(labels, quote=''):
+    return ','.join('{0}={2}{1}{2}'.format(k, v, quote) for k, v in labels)
+
+def stats():
+    '''Get dict of all counters by name, see module docstring'''
+    result = OrderedDict()
+    with _lock:
+        items = list(_counters.items())
+    for (name, labels), value in sorted(items, key=lambda i: i[0]):
+        if labels:
+            result.setdefault(name, OrderedDict())[label_str(labels)] = value
+        else:
+            result[name] = value
+    return result
+
+def prometheus(prefix='linksyr_'):
+    '''Get all counters in the Prometheus text exposition format'''
+    lines = []
+    with _lock:
+        items = list(_counters.items())
+    previous = None
+    for (name, labels), value in sorted(items, key=lambda i: i[0]):
+        if name != previous:
+            lines.append('# TYPE {0}{1} counter'.format(prefix, name))
+            previous = name
+        lines.append('{0}{1}{2} {3}'.format(
+            prefix, name,
+            '{' + label_str(labels, '"') + '}' if labels else '',
+            repr(float(value)) if isinstance(value, float) else value))
+    return '\n'.join(lines) + '\n' if lines else ''
@@ -14,6 +14,7 @@
 
 # pattern functions
 import difflib
+import instrument
 
 def get_pattern(stem, lexeme):
     # TODO check if this method can be improved, e.g. by looking for patterns
@@ -134,16 +135,44 @@ def get_tag(w):
 # In[5]:
 
 
-# prefixes = set(w.prefix for w in nt)
-# suffixes = set(w.suffix for w in nt)
-prefixes = {'', 'D', 'DL', 'DB', 'DD', 'B', 'WLD', 'DLD', 'WBD', 'WB', 'L',
-            'W', 'WD', 'BD', 'WDB', 'LDL', 'WL', 'LD', 'WDL'}
-suffixes = {'', 'JHJ', 'WNNJ', 'WNH', 'J', 'KJ', 'WNKJ', 'JWHJ', 'WH', 'HTJ',
-            'WNJHJ', 'W', 'HWN', 'KJN', 'WHJN', 'HJN', 'WNJ', 'WKWN', 'WHWN',
-            'NN', 'WHJ', 'N>', 'JN', 'WNKWN', 'HJKWN', 'T', 'JHWN', 'TWN',
-            'NK', 'JH', 'HJK', 'JNJ', 'HJH', 'JKWN', 'JHJN', 'WK', 'JKJ',
-            'NJHJ', 'WNN', 'K', 'H', 'KWN', 'JKJN', 'WN', 'JK', 'HWHJ', 'NJ',
-            'WKJ', 'WNK', 'N', 'HJ'}
+# The prefixes and suffixes are learned from the training corpus, see
+# MorphAn.train(), and stored in AffixTries.
+
+class AffixTrie:
+    '''Trie of affixes, to find all affixes at the start of a word, or with
+    reverse=True at the end, in one pass over the word'''
+
+    def __init__(self, affixes=(), reverse=False):
+        self.reverse = reverse
+        self.affixes = set()
+        self._root = {}     # character -> node, None -> True at affix ends
+        for affix in affixes:
+            self.add(affix)
+
+    def __len__(self):
+        return len(self.affixes)
+
+    def __contains__(self, affix):
+        return affix in self.affixes
+
+    def add(self, affix):
+        self.affixes.add(affix)
+        node = self._root
+        for ch in (affix[::-1] if self.reverse else affix):
+            node = node.setdefault(ch, {})
+        node[None] = True
+
+    def lengths(self, word):
+        '''Get list of lengths of all affixes of word, shortest first'''
+        node = self._root
+        result = [0] if None in node else []
+        for i, ch in enumerate(word[::-1] if self.reverse else word, 1):
+            node = node.get(ch)
+            if node is None:
+                break
+            if None in node:
+                result.append(i)
+        return result
 
 # In[6]:
 
@@ -155,13 +184,16 @@ suffixes = {'', 'JHJ', 'WNNJ', 'WNH', 'J', 'KJ', 'WNKJ', 'JWHJ', 'WH', 'HTJ',
 
 
 # helper functions for analysis
-def check_affixes(word):
-    for suffix in suffixes:
-        if word.endswith(suffix):
-            for prefix in prefixes:
-                if word.startswith(prefix) and len(word) > len(prefix+suffix):
-                    stem = word[len(prefix):len(word)-len(suffix)]
-                    yield (prefix, stem, suffix)
+def check_affixes(word, prefixes, suffixes):
+    '''Yield all (prefix, stem, suffix) of word with a non-empty stem, for
+    AffixTries of prefixes and suffixes'''
+    n = len(word)
+    prefix_lengths = prefixes.lengths(word)
+    for s in suffixes.lengths(word):
+        for p in prefix_lengths:
+            if p + s >= n:
+                break   # lengths are sorted, so all longer prefixes too
+            yield (word[:p], word[p:n-s], word[n-s:])
 
 # totalnumberofwordsincorpus = len(nt) # 109640
 #
@@ -269,22 +301,34 @@ class MorphAn:
 
     def __init__(self):
         self._trained = False
+        self.prefixes = AffixTrie()
+        self.suffixes = AffixTrie(reverse=True)
 
     def train(self, train_corpus):
-        self.corpus_length = len(train_corpus)
+        # any iterable of words, e.g. a text, a view on it or words()
+        self.corpus_length = 0
         self.number_lexemes = dict()   # total lexeme count in corpus, for probability calculation
         self.number_tags = dict()      # total tag count in corpus, for probability calculation
         self.lexemes_per_tag = dict()  # to check if a lexeme occurs with a given tag
         self.tags_per_pattern = dict() # to check if a tag occurs with a given pattern
         self.patterns_per_length = dict() # to look up patterns faster by looking only at the length of the stem
         self.number_patterntag = dict()
+        # affixes found in the corpus, and no affix
+        self.prefixes = AffixTrie([''])
+        self.suffixes = AffixTrie([''], reverse=True)
 
         for w in train_corpus:
+            self.corpus_length += 1
             tag = get_tag(w)
             pattern = get_pattern(w.stem, w.lexeme)
             lexeme = w.lexeme
             length = len(w.stem)
 
+            if w.prefix not in self.prefixes:
+                self.prefixes.add(w.prefix)
+            if w.suffix not in self.suffixes:
+                self.suffixes.add(w.suffix)
+
             if lexeme not in self.number_lexemes:
                 self.number_lexemes[lexeme] = 0
             self.number_lexemes[lexeme] += 1
@@ -313,12 +357,19 @@ class MorphAn:
 
     # here is the crucial function
     def analyze(self, word_string):
+        start = instrument.clock() if instrument.enabled else None
         analyses = []
-        for prefix, stem, suffix in check_affixes(word_string):
+        splits = patterns = matches = 0  # counted for instrument.stats()
+        for prefix, stem, suffix in check_affixes(word_string, self.prefixes,
+                                                   self.suffixes):
+            splits += 1
             if len(stem) in self.patterns_per_length:
-                for pattern in self.patterns_per_length[len(stem)]:
+                candidates = self.patterns_per_length[len(stem)]
+                patterns += len(candidates)     # calls of test_pattern()
+                for pattern in candidates:
                     lexeme = test_pattern(stem, pattern)
                     if lexeme:
+                        matches += 1
                         for tag in self.tags_per_pattern[pattern]:
                             if lexeme in self.lexemes_per_tag[tag]:
                                 analyses.append(
@@ -328,6 +379,14 @@ class MorphAn:
 
         # probabilities = normalize([getprb(lexeme, tag, pattern) for lexeme, tag, pattern in analyses])
         # return sorted(zip(analyses, probabilities), key=lambda x: x[1], reverse=True)
+        if start is not None:
+            instrument.add('morphan_analyze_seconds', instrument.clock() - start)
+            instrument.add('morphan_analyze_total')
+            instrument.add('morphan_affix_splits_total', splits)
+            instrument.add('morphan_patterns_tested_total', patterns)
+            instrument.add('morphan_candidates_total', matches)
+            # every analysis gets one probability evaluation by getprb()
+            instrument.add('morphan_probabilities_total', len(analyses))
         return normalized_analyses(analyses)
 
     # calculate the probabilities for each tag
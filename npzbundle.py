@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Export the annotated NT texts to columnar NumPy .npz bundles
+
+A bundle holds one integer column per field of the tokens of a text, in
+text order. Strings (forms, lexemes, roots, ...) are coded as positions
+in a string table, stored as '<field>.strings', and coded annotations
+and features have their labels in '<field>.labels'. The verses are in
+'verse_offsets' (offset of the first token of every verse, and of the
+end) and 'verse_book_id', 'verse_chapter' and 'verse_verse'.
+
+For SyrNT, the fields are cons_str and the annotation fields. For BFBS,
+they are the columns of the text, cons_str, voc_str, lexeme and root of
+the SEDRA word, and the fields of the word features ('feat.<FIELD>').
+All strings are in SEDRA transcription.
+
+Bundle(path) memory-maps all columns of a bundle, so that loading takes
+milliseconds and aggregation runs on arrays, e.g.:
+
+    b = Bundle('syrnt.npz')
+    counts = np.bincount(b['lexeme'])
+    top = b.strings('lexeme')[counts.argmax()]
+
+load_syrnt() and load_bfbs() rebuild SyrNT and BFBS texts on a bundle.
+"""
+
+from __future__ import unicode_literals, print_function
+import struct
+import zipfile
+import numpy as np
+
+import sedra
+import syrnt
+from constants import NT_BOOKS, NT_OFFSET, SyrNT as c
+
+SYRNT_FIELDS = tuple(f[0].replace(' ', '_') for f in c.ANNOTATIONS)
+
+
+def code_strings(values):
+    '''Get array of codes and sorted array of distinct strings'''
+    strings, codes = np.unique(np.array(values, dtype=np.str_),
+                               return_inverse=True)
+    return codes.astype(np.int32), strings
+
+def small_int_array(values):
+    a = np.asarray(values)
+    for dtype in (np.int8, np.int16, np.int32):
+        if len(a) == 0 or (a.min() >= np.iinfo(dtype).min and
+                           a.max() <= np.iinfo(dtype).max):
+            return a.astype(dtype)
+    return a.astype(np.int64)
+
+def verse_columns(labels, offsets):
+    '''Get bundle columns of the verses, from labels and offsets'''
+    return {'verse_offsets': np.asarray(offsets, dtype=np.int32),
+            'verse_book_id': np.array([l[1] for l in labels], dtype=np.int16),
+            'verse_chapter': np.array([l[2] for l in labels], dtype=np.int16),
+            'verse_verse': np.array([l[3] for l in labels], dtype=np.int16)}
+
+def add_string_column(columns, name, values):
+    columns[name], columns[name + '.strings'] = code_strings(values)
+
+def export_syrnt(path, text):
+    '''Write SyrNT text to .npz bundle at path'''
+    # column() gives values in the transcription of the text
+    text = text.transcribed(None)
+    columns = verse_columns([text.verse_label(i)
+                             for i in range(len(text.verse_offsets) - 1)],
+                            text.verse_offsets)
+    columns['kind'] = np.array('syrnt')
+    add_string_column(columns, 'cons_str', text.column('cons_str'))
+    for (name, labels), field in zip(c.ANNOTATIONS, SYRNT_FIELDS):
+        values = text.column(field, coded=True)
+        if all(isinstance(v, int) for v in values):
+            columns[field] = small_int_array(values)
+            if labels:
+                columns[field + '.labels'] = np.array(labels, dtype=np.str_)
+        else:
+            add_string_column(columns, field, values)
+    np.savez(path, **columns)
+
+def export_bfbs(path, text):
+    '''Write BFBS text, with fields of its SEDRA words, to .npz bundle'''
+    db = text.db.transcribed(None)
+    columns = dict(text.columns)
+    columns['kind'] = np.array('bfbs')
+    columns.update(verse_columns(
+        [text.verse_label(i) for i in range(len(text.verse_offsets) - 1)],
+        text.verse_offsets))
+    words, lexemes, roots = db.words, db.lexemes, db.roots
+    word_rows = np.asarray(words.rows)[text.columns['word_id']]
+    for key in ('cons_str', 'voc_str'):
+        add_string_column(columns, key, words.column(key))
+        columns[key] = columns[key][word_rows]
+    # lexeme and root of every word, with '' for none
+    lex_rows = np.asarray(lexemes.rows)[np.asarray(words.column('lex_addr'))]
+    lex_str = np.array(lexemes.column('lex_str') + [''], dtype=np.str_)
+    root_rows = np.asarray(roots.rows)[np.asarray(lexemes.column('root_addr'))]
+    rt_str = np.array(roots.column('rt_str') + [''], dtype=np.str_)
+    word_lex = lex_str[lex_rows]    # row -1 (no lexeme) gives ''
+    word_root = rt_str[np.where(lex_rows >= 0, root_rows[lex_rows], -1)]
+    for key, values in (('lexeme', word_lex), ('root', word_root)):
+        add_string_column(columns, key, values)
+        columns[key] = columns[key][word_rows]
+    feat = np.asarray(words.column('feat'))[word_rows]
+    features = words.record_class.features
+    for name, (codes, labels) in zip(words.record_class.Features._fields,
+                                     features.decode.split_column(feat)):
+        columns['feat.' + name] = small_int_array(codes)
+        if labels:
+            columns['feat.{0}.labels'.format(name)] = np.array(
+                labels, dtype=np.str_)
+    np.savez(path, **columns)
+
+def mmap_npz(path):
+    '''Get dict of arrays in uncompressed .npz file, memory-mapped'''
+    arrays = {}
+    with zipfile.ZipFile(path) as z, open(path, 'rb') as f:
+        for info in z.infolist():
+            name = info.filename[:-4]   # strip '.npy'
+            if info.compress_type != zipfile.ZIP_STORED:
+                arrays[name] = np.load(z.open(info))
+                continue
+            # the data follows the local header of the member
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(f)
+            else:
+                header = np.lib.format.read_array_header_2_0(f)
+            shape, fortran_order, dtype = header
+            if dtype.hasobject or not np.prod(shape):
+                f.seek(info.header_offset + 30 + name_len + extra_len)
+                arrays[name] = np.lib.format.read_array(f)
+            else:
+                arrays[name] = np.memmap(path, dtype, 'r', f.tell(), shape,
+                                         'F' if fortran_order else 'C')
+    return arrays
+
+
+class Bundle:
+    '''Memory-mapped columns of a text, as written by export_*()'''
+
+    def __init__(self, path):
+        self.path = path
+        self.arrays = mmap_npz(path)
+        self.kind = str(self.arrays['kind'])
+        self._strings = {}
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __contains__(self, name):
+        return name in self.arrays
+
+    def __len__(self):
+        return int(self.arrays['verse_offsets'][-1])
+
+    def keys(self):
+        return [k for k in self.arrays if k != 'kind' and
+                not k.endswith(('.strings', '.labels'))]
+
+    def strings(self, name):
+        '''Get string table of coded string column name, as a list'''
+        try:
+            return self._strings[name]
+        except KeyError:
+            strings = self._strings[name] = \
+                self.arrays[name + '.strings'].tolist()
+            return strings
+
+    def labels(self, name):
+        '''Get labels of coded column name, or None'''
+        labels = self.arrays.get(name + '.labels')
+        return None if labels is None else labels.tolist()
+
+    def values(self, name):
+        '''Get values of column name, decoded if it is coded'''
+        if name + '.strings' in self.arrays:
+            return StringColumn(self.arrays[name], self.strings(name))
+        labels = self.labels(name)
+        if labels is not None:
+            return StringColumn(self.arrays[name], labels)
+        return self.arrays[name]
+
+    def verse_labels(self):
+        return [(NT_BOOKS[b - NT_OFFSET][0], b, ch, v) for b, ch, v in zip(
+            self['verse_book_id'].tolist(), self['verse_chapter'].tolist(),
+            self['verse_verse'].tolist())]
+
+    # source of SyrNT and BFBS, see load_syrnt() and load_bfbs()
+    def read_syrnt(self):
+        if self.kind != 'syrnt':
+            raise ValueError('Not a SyrNT bundle: {0}'.format(self.path))
+        # the distinct rows of the annotation columns are the types,
+        # found as distinct byte strings, which is faster than axis=0
+        codes = np.ascontiguousarray(np.stack(
+            [self[f].astype(np.int32) for f in SYRNT_FIELDS], axis=1))
+        keys = codes.view(np.dtype((np.void, codes.itemsize *
+                                    codes.shape[1]))).ravel()
+        first, ids = np.unique(keys, return_index=True,
+                               return_inverse=True)[1:]
+        rows = codes[first]
+        columns = [self.strings(f) if f + '.strings' in self.arrays else None
+                   for f in SYRNT_FIELDS]
+        annotations = [tuple(v if s is None else s[v]
+                             for v, s in zip(row, columns))
+                       for row in rows.tolist()]
+        return (syrnt.Types(self.strings('cons_str'), self['cons_str']),
+                syrnt.Types(annotations, ids.ravel().astype(np.int32)),
+                self.verse_labels(), self['verse_offsets'].tolist())
+
+    def read_bfbs(self):
+        if self.kind != 'bfbs':
+            raise ValueError('Not a BFBS bundle: {0}'.format(self.path))
+        return [self[k] for k in sedra.BFBS.column_names]
+
+
+class StringColumn(object):
+    '''Sequence of strings, stored as codes into a string table'''
+
+    def __init__(self, codes, strings):
+        self.codes = codes
+        self.strings = strings
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return self.strings[self.codes[i]]
+
+
+def load_syrnt(path, tr=syrnt.towit):
+    '''Get SyrNT text on the bundle at path'''
+    return syrnt.SyrNT(tr, source=Bundle(path))
+
+def load_bfbs(path, tr=sedra.towit, db=None):
+    '''Get BFBS text on the bundle at path, with the shared SEDRA database'''
+    return sedra.BFBS(tr, db=db, lazy=True, source=Bundle(path))
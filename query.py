@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Search the New Testament for sequences of words
+
+A query is a sequence of terms in square brackets, each of which holds
+constraints on the fields of a word, separated by commas:
+
+    [lexeme=MLK>] <3 [verbal_conjugation=aphel]
+    [prefix=D, grammatical_category=participle|verb] .. [lexeme!=L]
+
+A constraint has the form field=value or field!=value, where value may
+list alternatives separated by |. Field names that are not found as
+given are matched without regard to case, but values must match exactly,
+since case is significant in SEDRA transcription. An empty term []
+matches any word. Between two terms, <N means that the second follows
+within N words of the first, and .. means that it follows anywhere later
+in the same verse. Terms without either follow each other directly.
+Matches never cross a verse boundary.
+
+Fields are those of concordance.get_fields(): for SyrNT cons_str and the
+annotation fields, for BFBS lexeme, root, cons_str, voc_str and the
+features and attributes of the SEDRA word. Every term is evaluated on
+the postings of the concordance, and the terms are joined starting from
+the term with the fewest candidates:
+
+    q = Query(syrnt.SyrNT())
+    for match in q.run('[lexeme=MLK>] <3 [verbal_conjugation=aphel]'):
+        print(match.reference, [str(w) for w in match.words])
+"""
+
+from __future__ import unicode_literals, print_function
+import re
+from collections import namedtuple
+import numpy as np
+from concordance import Concordance, get_fields
+
+INFINITE = 1 << 30
+
+TOKEN = re.compile(r'''\s*(?:
+    \[(?P<term>[^\]]*)\]        # term
+    |<\s*(?P<within>\d+)        # gap: within N words
+    |(?P<anywhere>\.\.)         # gap: anywhere later in the verse
+    )''', re.VERBOSE)
+
+Constraint = namedtuple('Constraint', ['field', 'negated', 'values'])
+Match = namedtuple('Match', ['label', 'reference', 'positions', 'words'])
+
+
+def parse_term(s):
+    '''Get tuple of constraints from the contents of a term'''
+    constraints = []
+    for c in s.split(','):
+        if not c.strip():
+            continue
+        field, sep, values = c.partition('=')
+        if not sep:
+            raise ValueError('Invalid constraint: {0}'.format(c))
+        field = field.strip()
+        negated = field.endswith('!')
+        constraints.append(Constraint(field.rstrip('!').strip(), negated,
+                                      tuple(v.strip() for v in values.split('|'))))
+    return tuple(constraints)
+
+def parse_query(s):
+    '''Get list of terms and list of gaps (min, max distance) between them'''
+    terms, gaps, gap = [], [], None
+    pos = 0
+    s = s.rstrip()
+    while pos < len(s):
+        m = TOKEN.match(s, pos)
+        if m is None:
+            raise ValueError('Invalid query at: {0}'.format(s[pos:]))
+        pos = m.end()
+        if m.group('term') is not None:
+            if terms:
+                gaps.append(gap or (1, 1))
+            elif gap:
+                raise ValueError('Query starts with a gap')
+            terms.append(parse_term(m.group('term')))
+            gap = None
+        elif gap is not None:
+            raise ValueError('Two gaps in a row')
+        elif m.group('within') is not None:
+            gap = (1, int(m.group('within')))
+        else:
+            gap = (1, INFINITE)
+    if not terms or gap is not None:
+        raise ValueError('Query must start and end with a term')
+    return terms, gaps
+
+def expand(starts, counts):
+    '''Get indexes starts[i] + (0..counts[i]-1) for all i, concatenated'''
+    total = int(counts.sum())
+    steps = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + steps
+
+
+class Query:
+    '''Sequence pattern query engine on a BFBS or SyrNT text'''
+
+    def __init__(self, text, concordance=None):
+        self.text = text
+        self.concordance = concordance or Concordance(text)
+        self.fields = get_fields(text)
+        self.offsets = np.asarray(text.verse_offsets, dtype=np.int64)
+        self._keys = {}
+
+    def resolve_field(self, name):
+        if name in self.fields:
+            return name
+        for field in self.fields:
+            if field.lower() == name.lower():
+                return field
+        raise KeyError('Unknown field: {0}'.format(name))
+
+    def resolve_value(self, field, value):
+        '''Get list of index keys of value of field'''
+        # keys are strings, codes or (for BFBS lexemes and roots) records,
+        # of which several may have the same string
+        try:
+            keys = self._keys[field]
+        except KeyError:
+            keys = self._keys[field] = {}
+            for k in self.concordance.index(field):
+                keys.setdefault(str(k), []).append(k)
+        return keys.get(value, [])
+
+    def postings(self, constraint):
+        '''Get sorted positions of all words that have one of the values'''
+        field = self.resolve_field(constraint.field)
+        arrays = []
+        for value in constraint.values:
+            for key in self.resolve_value(field, value):
+                arrays.append(self.concordance.postings(field, key))
+        if not arrays:
+            return np.array([], dtype=np.int32)
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.unique(np.concatenate(arrays))
+
+    def candidates(self, term):
+        '''Get sorted positions of all words that satisfy term'''
+        postings = [(self.postings(c), c.negated) for c in term]
+        include = sorted([p for p, negated in postings if not negated], key=len)
+        exclude = [p for p, negated in postings if negated]
+        if include:
+            # intersect the most selective postings first
+            result = include[0]
+            for p in include[1:]:
+                result = np.intersect1d(result, p, assume_unique=True)
+        else:
+            result = np.arange(len(self.text), dtype=np.int32)
+        for p in exclude:
+            result = np.setdiff1d(result, p, assume_unique=True)
+        return result
+
+    def verse_of(self, positions):
+        return np.searchsorted(self.offsets, positions, side='right') - 1
+
+    def extend(self, matches, positions, gap, right=True):
+        '''Extend matches with a term on the right or on the left'''
+        lo, hi = gap
+        if right:
+            end = matches[:, -1]
+            stop = self.offsets[self.verse_of(end) + 1] - 1
+            first = end + lo
+            last = np.minimum(end + hi, stop)
+        else:
+            start = matches[:, 0]
+            begin = self.offsets[self.verse_of(start)]
+            first = np.maximum(start - hi, begin)
+            last = start - lo
+        left = np.searchsorted(positions, first, side='left')
+        right_ = np.searchsorted(positions, last, side='right')
+        counts = np.maximum(right_ - left, 0)
+        rows = np.repeat(np.arange(len(matches)), counts)
+        new = positions[expand(left, counts)][:, None]
+        parts = (matches[rows], new) if right else (new, matches[rows])
+        return np.hstack(parts)
+
+    def positions(self, query):
+        '''Get array with a row of token positions for every match'''
+        terms, gaps = parse_query(query)
+        candidates = [self.candidates(term).astype(np.int64) for term in terms]
+        # start with the most selective term, then join the others
+        anchor = min(range(len(terms)), key=lambda i: len(candidates[i]))
+        matches = candidates[anchor][:, None]
+        for i in range(anchor + 1, len(terms)):
+            matches = self.extend(matches, candidates[i], gaps[i-1])
+        for i in range(anchor - 1, -1, -1):
+            matches = self.extend(matches, candidates[i], gaps[i], right=False)
+        if len(matches):
+            order = np.lexsort(matches.T[::-1])
+            matches = matches[order]
+        return matches
+
+    def count(self, query):
+        return len(self.positions(query))
+
+    def run(self, query):
+        '''Generate matches, with verse label and reference'''
+        matches = self.positions(query)
+        verses = self.verse_of(matches[:, 0]) if len(matches) else []
+        text = self.text
+        for positions, i in zip(matches.tolist(), list(verses)):
+            label = text.verse_label(int(i))
+            yield Match(label, '{0} {1}:{2}'.format(label[0], *label[2:]),
+                        tuple(positions), [text[p] for p in positions])
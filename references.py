@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Look up passages of the New Testament by reference
+
+A ReferenceIndex maps books, chapters and verses to spans of token
+positions in a corpus, given the verse labels and the offsets of the
+first token of every verse. References can be given as strings, e.g.
+'Rom 8:28', 'Rom 8:28-39', 'Matt 5:1-7:29', 'John 1-3' or 'Jude',
+using the book names in constants.NT_BOOKS (in any case). In books of
+one chapter, a single number is a verse, e.g. 'Jude 5' or 'Phlm 8-10'.
+
+The References mixin adds passage lookup to a text, such as sedra.BFBS
+and syrnt.SyrNT.
+"""
+
+from __future__ import unicode_literals, print_function
+import re
+from constants import NT_BOOKS, NT_OFFSET
+
+BOOK_IDS = dict((name.lower(), book_id)
+                for book_id, (name, chapters) in enumerate(NT_BOOKS, NT_OFFSET))
+# books of one chapter, e.g. Jude
+SINGLE_CHAPTER = set(book_id for book_id, (name, chapters)
+                     in enumerate(NT_BOOKS, NT_OFFSET) if len(chapters) == 1)
+
+REFERENCE = re.compile(r'''^\s*
+    (?P<book>\d?\s*[^\W\d]+)\s*
+    (?:(?P<chapter>\d+)(?:\s*[:.]\s*(?P<verse>\d+))?)?
+    (?P<end>\s*[-–]\s*
+        (?P<end_book>\d?\s*[^\W\d]+)?\s*
+        (?:(?P<end_1>\d+)(?:\s*[:.]\s*(?P<end_2>\d+))?)?
+    )?\s*$''', re.VERBOSE | re.UNICODE)
+
+
+def get_book_id(book):
+    '''Get book id from book name or id'''
+    if isinstance(book, int):
+        if book - NT_OFFSET in range(len(NT_BOOKS)):
+            return book
+    else:
+        try:
+            return BOOK_IDS[book.replace(' ', '').lower()]
+        except KeyError:
+            pass
+    raise KeyError('Unknown book: {0}'.format(book))
+
+def parse_reference(s):
+    '''Parse reference string into start and end
+
+    Both start and end are tuples (book_id, chapter, verse), in which
+    chapter and verse are None if the reference is to a whole book or
+    chapter, e.g. 'John 1-3' gives ((55, 1, None), (55, 3, None)).
+    '''
+    m = REFERENCE.match(s)
+    if m is None or (m.group('end') is not None and
+                     m.group('end_book') is None and m.group('end_1') is None):
+        raise ValueError('Invalid reference: {0}'.format(s))
+    book = get_book_id(m.group('book'))
+    chapter, verse = [int(e) if e else None
+                      for e in m.group('chapter', 'verse')]
+    if book in SINGLE_CHAPTER and chapter is not None and verse is None:
+        chapter, verse = 1, chapter     # 'Jude 5' is verse 5
+    start = (book, chapter, verse)
+    end_book, end_1, end_2 = m.group('end_book', 'end_1', 'end_2')
+    if m.group('end') is None:
+        return start, start
+    if end_book is not None:
+        # range across books, e.g. 'Matt 28:16-Mark 1:8'
+        end_book = get_book_id(end_book)
+        end_chapter = int(end_1) if end_1 else None
+        end_verse = int(end_2) if end_2 else None
+        if (end_book in SINGLE_CHAPTER and end_chapter is not None
+                and end_verse is None):
+            end_chapter, end_verse = 1, end_chapter
+    elif end_2 is not None:
+        end_book, end_chapter, end_verse = book, int(end_1), int(end_2)
+    elif verse is not None:
+        end_book, end_chapter, end_verse = book, chapter, int(end_1)
+    else:
+        end_book, end_chapter, end_verse = book, int(end_1), None
+    return start, (end_book, end_chapter, end_verse)
+
+
+class ReferenceIndex:
+    '''Constant time lookup of token spans by book, chapter and verse'''
+
+    def __init__(self, labels, offsets):
+        '''Make index from verse labels and token offsets
+
+        labels contains a (book_id, chapter, verse) tuple for every
+        verse in the corpus, in order, and offsets the position of the
+        first token of every verse, followed by the number of tokens.
+        '''
+        self.offsets = [int(o) for o in offsets]
+        self._verses = {}   # (book_id, chapter, verse): verse number
+        self._chapters = {} # (book_id, chapter): [first, last + 1]
+        self._books = {}    # book_id: [first, last + 1]
+        for i, (book_id, chapter, verse) in enumerate(labels):
+            self._verses[(book_id, chapter, verse)] = i
+            self._chapters.setdefault((book_id, chapter), [i, i])[1] = i + 1
+            self._books.setdefault(book_id, [i, i])[1] = i + 1
+
+    def verses(self, book, chapter=None, verse=None):
+        '''Get range of verse numbers of a book, chapter or verse'''
+        book_id = get_book_id(book)
+        try:
+            if chapter is None:
+                first, last = self._books[book_id]
+            elif verse is None:
+                first, last = self._chapters[(book_id, chapter)]
+            else:
+                first = self._verses[(book_id, chapter, verse)]
+                last = first + 1
+        except KeyError:
+            raise KeyError('Reference not found: {0} {1}:{2}'.format(
+                NT_BOOKS[book_id-NT_OFFSET][0], chapter, verse))
+        return first, last
+
+    def span(self, reference, chapter=None, verse=None):
+        '''Get (start, stop) token positions of a reference
+
+        The reference is either a reference string, such as 'John 1-3',
+        or a book name or id, optionally with chapter and verse.
+        '''
+        if chapter is None and not isinstance(reference, int):
+            start, end = parse_reference(reference)
+        else:
+            start = end = (get_book_id(reference), chapter, verse)
+        first = self.verses(*start)[0]
+        last = self.verses(*end)[1]
+        if last <= first:
+            raise ValueError('Empty range: {0}'.format(reference))
+        return self.offsets[first], self.offsets[last]
+
+
+class References(object):
+    '''Mixin for texts, adding lookup of passages by reference
+
+    The text has verse_offsets, verse_label(i) to get the label
+    (book_name, book_id, chapter, verse) of verse i, and slicing, which
+    gives views on its words.
+    '''
+
+    _references = None
+
+    @property
+    def references(self):
+        '''Index of token positions by book, chapter and verse'''
+        if self._references is None:
+            offsets = self.verse_offsets
+            labels = [self.verse_label(i)[1:] for i in range(len(offsets) - 1)]
+            self._references = ReferenceIndex(labels, offsets)
+        return self._references
+
+    def passage(self, reference, chapter=None, verse=None):
+        '''Get words of a reference, e.g. 'John 1-3' or 'Rom', 8, 28'''
+        start, stop = self.references.span(reference, chapter, verse)
+        return self[start:stop]
+
+    def select(self, *references):
+        '''Get view on the words of references, e.g. select('Matt', 'Mark')'''
+        return sum((self.passage(r) for r in references[1:]),
+                   self.passage(references[0]))
+
+    def book(self, book):
+        return self.passage(book)
+
+    def chapter(self, book, chapter):
+        return self.passage(book, chapter)
+
+    def verse(self, book, chapter, verse):
+        return self.passage(book, chapter, verse)
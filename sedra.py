@@ -41,11 +41,20 @@ the description seems to apply roughly to BFBS.TXT.
 # TODO
 # Add documentation to classes/methods.
 
-# now it works in python 2.[67] and 3.x!
 from __future__ import unicode_literals, print_function
 import os
+import marshal
+import struct
+import threading
+from array import array
+from hashlib import sha1
 from collections import namedtuple
-from constants import NT_BOOKS, SedraIII as c
+from sys import intern
+from constants import NT_BOOKS, NT_OFFSET, SedraIII as c
+from references import ReferenceIndex, References
+from views import View
+import instrument
+import numpy as np
 
 CFG_FILENAME = 'linksyr.conf'
 CFG_SECTION = 'sedra'
@@ -69,7 +78,10 @@ CFG_ITEMS = dict(cfg.items(CFG_SECTION))
 DB_DIR = CFG_ITEMS[CFG_FIELDS[0]]
 # DB_FILES = tuple(CFG_ITEMS[s] for s in CFG_FIELDS[1:6])
 NT_FILE = CFG_ITEMS[CFG_FIELDS[6]]
-NT_OFFSET = 52  # starting id of NT books
+# snapshots of loaded data are kept in cachedir, if given, else in datadir
+CACHE_DIR = CFG_ITEMS.get('cachedir', DB_DIR)
+# the version number changes with every change of the stored data
+SNAPSHOT_MAGIC = b'LINKSYR SNAPSHOT 2\n'
 
 
 # helper functions
@@ -90,25 +102,170 @@ def get_identifier(o):
 def get_address(a):
     return tuple(int(e) for e in a.split(':')) if a != 'NULL' else None
 
+def get_id(a):
+    return int(a.split(':')[1])
+
+def get_record_id(a):
+    '''Get record id from address string, or 0 if it is NULL'''
+    return int(a.split(':')[1]) if a != 'NULL' else 0
+
 def get_values(n, fields):
-    # TODO calculating bit groups for every record may be inefficient,
-    # maybe it could be done once in a class variable?
-    bit_groups = [f_bits for (f_name, f_bits, f_values) in fields]
-    bits = 32 if sum(bit_groups) > 16 else 16
-    values = split_bits(n, bit_groups, bits)
-    return [(l[2][n] if l[2] else n) for l, n in zip(fields, values)]
+    if instrument.enabled:
+        instrument.add('sedra_decode_total')
+        with instrument.timer('sedra_decode_seconds'):
+            return get_bit_fields(fields)(n)
+    return get_bit_fields(fields)(n)
 
 def split_bits(n, groups, bits=16):
-    if n<0: n+=(1<<bits) # shift bits https://stackoverflow.com/a/20768199
-    b = '{0:0{1}b}'.format(n, bits) # convert to binary
+    # bits is not needed anymore: shifting and masking a negative
+    # number gives the same bits as its two's complement would
     result = []
-    start = None
     for size in groups:
-        end = start-size if start is not None else -size
-        result.append(int(b[end:start], 2)) # convert slice back to int
-        start = end
+        result.append(n & ((1 << size) - 1))
+        n >>= size
+    return tuple(result)
+
+_bit_fields = {}
+
+def get_bit_fields(fields):
+    '''Get compiled decoder for field table, e.g. c.WORDS_FEAT'''
+    # the decoder keeps a reference to fields, so its id is never reused
+    try:
+        return _bit_fields[id(fields)]
+    except KeyError:
+        decoder = _bit_fields[id(fields)] = BitFields(fields)
+        return decoder
+
+def make_index(table, key):
+    '''Group row numbers of table by the value of key, in a dict of lists'''
+    # addresses are stored as record ids, since a foreign key always
+    # points to one file, with 0 for NULL
+    skip = 0 if key.endswith('_addr') else None
+    column = table.column(key)
+    if isinstance(column, array) and len(column):
+        # group equal values in one sorting pass
+        values = np.asarray(column)
+        order = np.argsort(values, kind='stable')
+        values = values[order]
+        bounds = np.flatnonzero(values[1:] != values[:-1]) + 1
+        keys = values[np.concatenate(([0], bounds))].tolist()
+        bounds = [0] + bounds.tolist() + [len(values)]
+        rows = order.tolist()
+        return dict((k, rows[bounds[i]:bounds[i+1]])
+                    for i, k in enumerate(keys) if k != skip)
+    index = {}
+    for row, value in enumerate(column):
+        if value == skip:
+            continue
+        try:
+            index[value].append(row)
+        except KeyError:
+            index[value] = [row]
+    return index
+
+def make_column(values):
+    '''Store integers in an array, and strings as interned strings'''
+    values = list(values)
+    if all(isinstance(v, int) for v in values):
+        return array('i', values)
+    return [intern(v) for v in values]
+
+def get_column_state(column):
+    '''Get column in a form that can be stored in a snapshot'''
+    if isinstance(column, array):
+        return (column.typecode, column.tobytes())
+    return (None, tuple(column))
+
+def restore_column(state):
+    typecode, data = state
+    if typecode is None:
+        return [intern(v) for v in data]
+    column = array(typecode)
+    column.frombytes(data)
+    return column
+
+def tr_name(tr):
+    '''Get short name of translation table'''
+    if tr is None:
+        return 'notr'
+    return sha1(repr(sorted(tr.items())).encode('utf-8')).hexdigest()[:12]
+
+def file_digest(path):
+    h = sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def source_signature(db_dir, filenames):
+    '''Get (filename, size, mtime, sha1) for every source file'''
+    result = []
+    for filename in filenames:
+        path = os.path.join(db_dir, filename)
+        st = os.stat(path)
+        result.append((filename, st.st_size, st.st_mtime, file_digest(path)))
     return tuple(result)
 
+def sources_match(signature, db_dir, filenames):
+    '''Check if the source files still match a snapshot signature'''
+    if tuple(s[0] for s in signature) != tuple(filenames):
+        return False
+    for filename, size, mtime, digest in signature:
+        path = os.path.join(db_dir, filename)
+        st = os.stat(path)
+        if st.st_size != size:
+            return False
+        # only calculate the hash if the file may have been touched
+        if st.st_mtime != mtime and file_digest(path) != digest:
+            return False
+    return True
+
+def same_dir(a, b):
+    '''Test if paths a and b name the same directory'''
+    return (os.path.normcase(os.path.abspath(a)) ==
+            os.path.normcase(os.path.abspath(b)))
+
+def snapshot_path(kind, db_dir=DB_DIR):
+    # snapshots hold strings in SEDRA transcription only, since other
+    # transcriptions are rendered from those when records are accessed
+    cache_dir = CACHE_DIR if same_dir(db_dir, DB_DIR) else db_dir
+    return os.path.join(cache_dir, '{0}.snapshot'.format(kind))
+
+def read_snapshot(path, db_dir, filenames):
+    '''Get data stored in snapshot, or None if missing or out of date'''
+    # marshal.load() on a file object is slow, so the length of the
+    # signature is stored, and the data is read from bytes at once
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            size, = struct.unpack('<Q', f.read(8))
+            if not sources_match(marshal.loads(f.read(size)),
+                                 db_dir, filenames):
+                return None
+            return marshal.loads(f.read())
+    except (IOError, OSError, EOFError, ValueError, TypeError, struct.error):
+        return None
+
+def write_snapshot(path, db_dir, filenames, data):
+    '''Store data in snapshot, along with signature of source files'''
+    # write to temporary file first, so that concurrent readers
+    # never see a half-written snapshot
+    tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as f:
+            signature = marshal.dumps(source_signature(db_dir, filenames))
+            f.write(SNAPSHOT_MAGIC)
+            f.write(struct.pack('<Q', len(signature)))
+            f.write(signature)
+            marshal.dump(data, f)
+        os.replace(tmp_path, path)
+    except (IOError, OSError):
+        # a snapshot is only an optimization, so silently give up
+        # if the cache directory is not writable
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 def maketrans(s1, s2):
     '''Make a simple translation table'''
     # There are more sophisticated maketrans-functions (str.maketrans()
@@ -125,189 +282,420 @@ notr = maketrans('','')
 
 # classes
 
-class Root:
-    # example input line: 0:1,"AAR","aat          |0",0
+class BitFields:
+    '''Decoder for integers made of groups of bits, as described
+    by the field tables in constants.SedraIII'''
+
+    def __init__(self, fields):
+        self.fields = fields
+        self._groups = [] # (shift, mask, values), starting at lowest bit
+        shift = 0
+        for f_name, f_bits, f_values in fields:
+            self._groups.append((shift, (1 << f_bits) - 1, f_values))
+            shift += f_bits
+
+    def __call__(self, n):
+        '''Get list of values of all fields in n'''
+        return [v[(n >> s) & m] if v else (n >> s) & m
+                for s, m, v in self._groups]
+
+    def split_column(self, column):
+        '''Get list of (codes, values) of all fields, for a sequence of
+        integers, with the codes of a field in a numpy array'''
+        a = np.asarray(column, dtype=np.int64)
+        return [((a >> s) & m, v) for s, m, v in self._groups]
+
+    def decode_column(self, column):
+        '''Get list of value tuples for a sequence of integers'''
+        values = []
+        for codes, v in self.split_column(column):
+            if v:
+                values.append(np.array(v, dtype=object)[codes].tolist())
+            else:
+                values.append(codes.tolist())
+        return list(zip(*values))
+
+
+class Column(object):
+    '''Field of a record, stored in a column of its Table'''
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, o, cls=None):
+        if o is None:
+            return self
+        return getattr(o._table, self.name)[o._row]
+
+
+class TranscribedColumn(Column):
+    '''String field in SEDRA transcription, shown in transcription of db'''
+
+    def __init__(self, name, fix=None):
+        self.name = name
+        self.fix = fix
+
+    def __get__(self, o, cls=None):
+        if o is None:
+            return self
+        return o._table.rendered(self.name, self.fix)[o._row]
 
-    Attributes = namedtuple('Attributes',
-                    [f[0].strip('<>').replace(' ','_') for f in c.ROOTS_ATTR])
 
-    def __init__(self, line, file_no, name, db):
-        tr = db._tr
+class AddressColumn(Column):
+    '''Address of a record in another file, stored as record id'''
+
+    def __init__(self, name, file_no):
+        self.name = name
         self.file_no = file_no
+
+    def __get__(self, o, cls=None):
+        if o is None:
+            return self
+        r = getattr(o._table, self.name)[o._row]
+        return (self.file_no, r) if r else None
+
+
+class BitFieldColumn(Column):
+    '''Bit fields of a record, decoded into a namedtuple on request'''
+
+    def __init__(self, name, fields, nt):
         self.name = name
-        self.db = db
-        self.id = int(line[0].split(':')[1])
-        self.rt_str = line[1] if tr is None else line[1].translate(tr)
-        self.sort_str = line[2]
-        self.attr = int(line[3])
-        attr_values = get_values(self.attr, c.ROOTS_ATTR)
-        self.attributes = Root.Attributes(*attr_values)
-        # empty slot for lexemes
-        self._lexemes = None
+        self.nt = nt
+        self.decode = get_bit_fields(fields)
+        # values repeat a lot, so every value is decoded only once
+        self._cache = {}
+
+    def __get__(self, o, cls=None):
+        if o is None:
+            return self
+        n = getattr(o._table, self.name)[o._row]
+        try:
+            return self._cache[n]
+        except KeyError:
+            with instrument.timer('sedra_decode_seconds'):
+                value = self._cache[n] = self.nt(*self.decode(n))
+            instrument.add('sedra_decode_total')
+            return value
+
+    def decode_column(self, column):
+        '''Decode all distinct values in column at once'''
+        with instrument.timer('sedra_decode_seconds'):
+            new = sorted(set(column).difference(self._cache))
+            for n, v in zip(new, self.decode.decode_column(new)):
+                self._cache[n] = tuple.__new__(self.nt, v)
+        instrument.add('sedra_decode_total', len(new))
+
+
+class Record(object):
+    '''View on a row of a Table'''
+
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
 
     def __repr__(self):
         return get_identifier(self)
 
+    def __eq__(self, other):
+        return (type(self) is type(other) and self._table is other._table
+                and self._row == other._row)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self._table), self._row))
+
+    @property
+    def db(self):
+        return self._table.db
+
+    @property
+    def file_no(self):
+        return self._table.file_no
+
+    @property
+    def name(self):
+        return self._table.name
+
+    id = Column('id')
+
+
+class Root(Record):
+    # example input line: 0:1,"AAR","aat          |0",0
+
+    __slots__ = ()
+    Attributes = namedtuple('Attributes',
+                    [f[0].strip('<>').replace(' ','_') for f in c.ROOTS_ATTR])
+    _columns = ('id', 'rt_str', 'sort_str', 'attr')
+
+    rt_str = TranscribedColumn('rt_str')
+    sort_str = Column('sort_str')
+    attr = Column('attr')
+    attributes = BitFieldColumn('attr', c.ROOTS_ATTR, Attributes)
+
+    @staticmethod
+    def _parse(line):
+        return (get_id(line[0]),
+                line[1],
+                line[2],
+                int(line[3]))
+
     def __str__(self):
         return self.rt_str
 
     @property
     def lexemes(self):
-        if self._lexemes is None:
-            self._lexemes = self.db.filter('lexemes', 'root_addr', self.id)
-        return self._lexemes
+        return self.db.filter('lexemes', 'root_addr', self.id)
 
 
-class Lexeme:
+class Lexeme(Record):
     # example input line: 1:2,0:2,"ABA",41960448,16
 
+    __slots__ = ()
     Attributes = namedtuple('Attributes',
                     [f[0].strip('<>').replace(' ','_') for f in c.LEXEMES_ATTR])
     Features = namedtuple('Features',
                     [f[0].strip('<>').replace(' ','_') for f in c.LEXEMES_FEAT])
-
-    def __init__(self, line, file_no, name, db):
-        tr = db._tr
-        self.file_no = file_no
-        self.name = name
-        self.db = db
-        self.id = int(line[0].split(':')[1])
-        self.root_addr = get_address(line[1])
-        self.lex_str = line[2] if tr is None else line[2].translate(tr)
-        self.feat = int(line[3])
-        feat_values = get_values(self.feat, c.LEXEMES_FEAT)
-        self.features = Lexeme.Features(*feat_values)
-        self.attr = int(line[4])
-        attr_values = get_values(self.attr, c.LEXEMES_ATTR)
-        self.attributes = Lexeme.Attributes(*attr_values)
-        # shortcut to root
-        self.root = db.get(self.root_addr)
-        # empty slots for other properties, accessed with @property decorator
-        self._english = None # not yet available, initialized on first request
-        self._words = None
-        self._etymology = None
-
-
-    def __repr__(self):
-        return get_identifier(self)
+    _columns = ('id', 'root_addr', 'lex_str', 'feat', 'attr')
+
+    root_addr = AddressColumn('root_addr', 0)
+    lex_str = TranscribedColumn('lex_str')
+    feat = Column('feat')
+    features = BitFieldColumn('feat', c.LEXEMES_FEAT, Features)
+    attr = Column('attr')
+    attributes = BitFieldColumn('attr', c.LEXEMES_ATTR, Attributes)
+
+    @staticmethod
+    def _parse(line):
+        return (get_id(line[0]),
+                get_record_id(line[1]),
+                line[2],
+                int(line[3]),
+                int(line[4]))
 
     def __str__(self):
         return self.lex_str
 
+    @property
+    def root(self):
+        # shortcut to root
+        return self.db.get(self.root_addr)
+
     @property
     def english(self):
-        if self._english is None:
-            self._english = self.db.filter('english', 'lex_addr', self.id)
-        return self._english
+        return self.db.filter('english', 'lex_addr', self.id)
 
     @property
     def words(self):
-        if self._words is None:
-            self._words = self.db.filter('words', 'lex_addr', self.id)
-        return self._words
+        return self.db.filter('words', 'lex_addr', self.id)
 
     @property
     def etymology(self):
-        if self._etymology is None:
-            self._etymology = self.db.filter('etymology', 'lex_addr', self.id)
-        return self._etymology[0] if self._etymology else None
+        etymology = self.db.filter('etymology', 'lex_addr', self.id)
+        return etymology[0] if etymology else None
+
 
+def fix_digraphs(column, tr):
+    '''Correct transcription of digraph #_ in WIT transcription'''
+    if tr != towit:
+        return column
+    return [intern(s.replace('_', '#_')) if '_' in s else s for s in column]
 
-class Word:
+
+class Word(Record):
     # example input line: 2:3,1:1,"DAAR","D'oAAaR",558080,128
 
+    __slots__ = ()
     Attributes = namedtuple('Attributes',
                     [f[0].strip('<>').replace(' ','_') for f in c.WORDS_ATTR])
     Features = namedtuple('Features',
                     [f[0].strip('<>').replace(' ','_').replace('/','_') for f in c.WORDS_FEAT])
-
-    def __init__(self, line, file_no, name, db):
-        tr = db._tr
-        self.file_no = file_no
-        self.name = name
-        self.db = db
-        self.id = int(line[0].split(':')[1])
-        self.lex_addr = get_address(line[1])
-        self.cons_str = line[2] if tr is None else line[2].translate(tr)
-        self.voc_str = line[3] if tr is None else line[3].translate(tr)
-        # correct transcription of digraph #_ in WIT transcription
-        if tr == towit and '_' in self.voc_str:
-            self.voc_str = self.voc_str.replace('_', '#_')
-        self.feat = int(line[4])
-        feat_values = get_values(self.feat, c.WORDS_FEAT)
-        self.features = Word.Features(*feat_values)
-        self.attr = int(line[5])
-        attr_values = get_values(self.attr, c.WORDS_ATTR)
-        self.attributes = Word.Attributes(*attr_values)
-        # shortcuts to lexeme and root objects
-        self.lexeme = db.get(self.lex_addr)
-        self.root = self.lexeme.root if self.lexeme else None
-
-    def __repr__(self):
-        return get_identifier(self)
+    _columns = ('id', 'lex_addr', 'cons_str', 'voc_str', 'feat', 'attr')
+
+    lex_addr = AddressColumn('lex_addr', 1)
+    cons_str = TranscribedColumn('cons_str')
+    voc_str = TranscribedColumn('voc_str', fix=fix_digraphs)
+    feat = Column('feat')
+    features = BitFieldColumn('feat', c.WORDS_FEAT, Features)
+    attr = Column('attr')
+    attributes = BitFieldColumn('attr', c.WORDS_ATTR, Attributes)
+
+    @staticmethod
+    def _parse(line):
+        return (get_id(line[0]),
+                get_record_id(line[1]),
+                line[2],
+                line[3],
+                int(line[4]),
+                int(line[5]))
 
     def __str__(self):
         return self.cons_str
 
+    # shortcuts to lexeme and root objects
+    @property
+    def lexeme(self):
+        return self.db.get(self.lex_addr)
+
+    @property
+    def root(self):
+        lexeme = self.lexeme
+        return lexeme.root if lexeme else None
+
 
-class English:
+class English(Record):
     # example input line: 3:36,1:22,"land","parcel of","","",0,0
 
+    __slots__ = ()
     Attributes = namedtuple('Attributes',
                     [f[0].strip('<>').replace(' ','_') for f in c.ENGLISH_ATTR])
-
-    def __init__(self, line, file_no, name, db):
-        self.file_no = file_no
-        self.name = name
-        self.db = db
-        self.id = int(line[0].split(':')[1])
-        self.lex_addr = get_address(line[1])
-        self.meaning = line[2]
-        self.before = line[3]
-        self.after = line[4]
-        self.comment = line[5]
-        self.attr = int(line[6])
-        attr_values = get_values(self.attr, c.ENGLISH_ATTR)
-        self.attributes = English.Attributes(*attr_values)
-        self.ignore = int(line[7])
-        self._words = None
-        # shortcut to lexeme
-        self.lexeme = db.get(self.lex_addr)
-
-    def __repr__(self):
-        return get_identifier(self)
+    _columns = ('id', 'lex_addr', 'meaning', 'before', 'after', 'comment',
+                'attr', 'ignore')
+
+    lex_addr = AddressColumn('lex_addr', 1)
+    meaning = Column('meaning')
+    before = Column('before')
+    after = Column('after')
+    comment = Column('comment')
+    attr = Column('attr')
+    attributes = BitFieldColumn('attr', c.ENGLISH_ATTR, Attributes)
+    ignore = Column('ignore')
+
+    @staticmethod
+    def _parse(line):
+        return (get_id(line[0]),
+                get_record_id(line[1]),
+                line[2], line[3], line[4], line[5],
+                int(line[6]),
+                int(line[7]))
 
     def __str__(self):
         return self.meaning
 
+    @property
+    def lexeme(self):
+        # shortcut to lexeme
+        return self.db.get(self.lex_addr)
+
 
-class Etymology:
+class Etymology(Record):
     # example input line: 4:5,1:46,"eu\255jaristi\256a",5
 
+    __slots__ = ()
     Attributes = namedtuple('Attributes',
                     [f[0].strip('<>').replace(' ','_') for f in c.ETYMOLOGY_ATTR])
+    _columns = ('id', 'lex_addr', 'word_origin', 'attr')
 
-    def __init__(self, line, file_no, name, db):
-        self.file_no = file_no
-        self.name = name
-        self.db = db
-        self.id = int(line[0].split(':')[1])    # Record address, e.g. 4:1
-        self.lex_addr = get_address(line[1])    # Lexeme address (in LEXEMES.TXT), e.g. 1:1
-        self.word_origin = line[2]              # Word Origin, e.g. "a\255h\256r"
-        self.attr = int(line[3])
-        attr_values = get_values(self.attr, c.ETYMOLOGY_ATTR)
-        self.attributes = Etymology.Attributes(*attr_values)
-        # shortcut to lexeme
-        self.lexeme = db.get(self.lex_addr)
+    lex_addr = AddressColumn('lex_addr', 1)     # Lexeme address (in LEXEMES.TXT), e.g. 1:1
+    word_origin = Column('word_origin')         # Word Origin, e.g. "a\255h\256r"
+    attr = Column('attr')
+    attributes = BitFieldColumn('attr', c.ETYMOLOGY_ATTR, Attributes)
 
-    def __repr__(self):
-        return get_identifier(self)
+    @staticmethod
+    def _parse(line):
+        return (get_id(line[0]),                # Record address, e.g. 4:1
+                get_record_id(line[1]),
+                line[2],
+                int(line[3]))
 
     def __str__(self):
         # return self.attributes[0] # ['LANGUAGE']
         return '{0} from {1}: {2}'.format(
             self.lexeme, self.attributes[0], self.word_origin)
 
+    @property
+    def lexeme(self):
+        # shortcut to lexeme
+        return self.db.get(self.lex_addr)
+
+
+class Table(object):
+    '''Records of one SEDRA file, stored column by column'''
+
+    def __init__(self, db, file_no, name, record_class, columns, tr=None):
+        self.db = db
+        self.tr = tr
+        self.tr_key = tr_name(tr)
+        # transcribed string columns, shared by transcribed copies
+        self._rendered = {}
+        self.file_no = file_no
+        self.name = name
+        self.record_class = record_class
+        for key, column in zip(record_class._columns, columns):
+            setattr(self, key, column)
+        # direct index from record id to row number
+        self.rows = array('i', [-1]) * (max(self.id) + 1 if self.id else 0)
+        for row, record_id in enumerate(self.id):
+            self.rows[record_id] = row
+
+    def __len__(self):
+        return len(self.id)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.record_class(self, row)
+                    for row in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        return self.record_class(self, key)
+
+    def __iter__(self):
+        record_class = self.record_class
+        for row in range(len(self)):
+            yield record_class(self, row)
+
+    def get(self, record_id):
+        '''Get record by id'''
+        start = instrument.clock() if instrument.enabled else None
+        row = self.rows[record_id] if 0 <= record_id < len(self.rows) else -1
+        if row < 0:
+            raise KeyError(record_id)
+        record = self.record_class(self, row)
+        if start is not None:
+            instrument.add('sedra_resolve_seconds', instrument.clock() - start,
+                           file=self.name)
+            instrument.add('sedra_resolve_total', file=self.name)
+        return record
+
+    def column(self, key):
+        '''Get column of values of field key in all records'''
+        prop = getattr(self.record_class, key, None)
+        if isinstance(prop, TranscribedColumn):
+            return self.rendered(key, prop.fix)
+        return getattr(self, key)
+
+    def rendered(self, key, fix=None):
+        '''Get string column key in the transcription of this table'''
+        if self.tr is None and fix is None:
+            return getattr(self, key)
+        try:
+            return self._rendered[(key, self.tr_key)]
+        except KeyError:
+            column = getattr(self, key)
+            if self.tr is not None:
+                # translate every distinct string only once
+                strings = dict((s, intern(s.translate(self.tr)))
+                               for s in set(column))
+                column = [strings[s] for s in column]
+            if fix is not None:
+                column = fix(column, self.tr)
+            self._rendered[(key, self.tr_key)] = column
+            return column
+
+    def transcribed(self, db):
+        '''Get copy of table for db, sharing all columns'''
+        other = Table.__new__(Table)
+        other.__dict__.update(self.__dict__)
+        other.db = db
+        other.tr = db._tr
+        other.tr_key = tr_name(db._tr)
+        return other
+
 
 class SedraIII:
 
@@ -318,14 +706,43 @@ class SedraIII:
                   ('words',     Word),
                   ('english',   English),
                   ('etymology', Etymology))
-
-    def __init__(self, tr=towit):
+    # foreign keys, indexed when their file is imported
+    indexes = (('lexemes',   'root_addr'),
+               ('words',     'lex_addr'),
+               ('english',   'lex_addr'),
+               ('etymology', 'lex_addr'))
+
+    def __init__(self, tr=towit, cache=True, lazy=False, db_dir=None,
+                 workers=1, source=None):
+        '''Load the SEDRA database
+
+        With lazy=True, every file is loaded on first access of its
+        records, and bit fields are decoded on first access per record.
+        Otherwise all files are loaded and decoded at once.
+        The files are read from db_dir, or else from the configured datadir.
+        Files that are not in the cache are parsed in this process, or
+        with workers > 1 by up to workers processes at once (workers=None
+        for one per CPU). As usual with multiprocessing, a script doing
+        so must guard its main code with if __name__ == '__main__'.
+        If a source is given (e.g. sqlitedb.SQLiteSource), the columns
+        are read from that instead of from the text files.
+        '''
         self._tr = tr
-        self._dicts = {}
-        for file_no, (name, db_class) in enumerate(SedraIII.db_classes): # zip(SedraIII.files, SedraIII.classes):
-            addr_dict, db = self._import_db(file_no, name, db_class)
-            self._dicts[file_no] = addr_dict
-            setattr(self, name, db)
+        self._db_dir = DB_DIR if db_dir is None else db_dir
+        self._cache = cache
+        self._lazy = lazy
+        self._tables = {}
+        self._indexes = {}
+        self._base = None   # database this is a transcribed view of
+        self._source = source
+        if not lazy:
+            self._load_all(workers)
+
+    def __getattr__(self, name):
+        # only called if name is not found, i.e. for files not yet loaded
+        if name in SedraIII.files:
+            return self._load(SedraIII.files.index(name))
+        raise AttributeError(name)
 
     def get(self, address):
         '''Get record by address tuple'''
@@ -333,105 +750,504 @@ class SedraIII:
             return None
         else:
             f, r = address # file, record
-            return self._dicts[f][r]
+            return self.get_table(f).get(r)
+
+    def get_table(self, file_no):
+        try:
+            return self._tables[file_no]
+        except KeyError:
+            return self._load(file_no)
+
+    def index(self, db_file, key):
+        '''Get dict of lists of row numbers in db_file, by value of key'''
+        # indexes not built during import are built on first request.
+        # They are shared with transcribed views, so an index on strings
+        # is stored by the transcription of its keys
+        index_key = (db_file, key)
+        db_class = dict(SedraIII.db_classes)[db_file]
+        if isinstance(getattr(db_class, key, None), TranscribedColumn):
+            index_key += (tr_name(self._tr),)
+        try:
+            return self._indexes[index_key]
+        except KeyError:
+            index = make_index(getattr(self, db_file), key)
+            self._indexes[index_key] = index
+            return index
 
     def filter(self, db_file, key, search_id):
         '''Get list of all records in db_file where key == search_id'''
-        return [e for e in getattr(self, db_file)
-                if getattr(e, key) is not None
-                and getattr(e, key)[1] == search_id]
+        table = getattr(self, db_file)
+        return [table[row]
+                for row in self.index(db_file, key).get(search_id, ())]
+
+    def transcribed(self, tr):
+        '''Get view on this database in transcription tr
+
+        The view shares all records and indexes with this database, only
+        strings in a new transcription are rendered, on first access.
+        '''
+        other = SedraIII.__new__(SedraIII)
+        other._tr = tr
+        other._db_dir = self._db_dir
+        other._cache = self._cache
+        other._lazy = self._lazy
+        other._tables = {}
+        other._indexes = self._indexes  # see index()
+        other._base = self
+        other._source = self._source
+        for table in self._tables.values():
+            other._add_table(table.transcribed(other))
+        return other
+
+    def _add_table(self, table):
+        self._tables[table.file_no] = table
+        setattr(self, table.name, table)
+        return table
+
+    def _load(self, file_no):
+        if self._base is not None:
+            table = self._base.get_table(file_no)
+            return self._add_table(table.transcribed(self))
+        name = SedraIII.files[file_no]
+        if self._source is not None:
+            return self._link(file_no, self._source.read_table(name))
+        state = self._read_snapshot(name)
+        if state is None:
+            state = parse_db_file(self._db_dir, name)
+            self._write_snapshot(name, state)
+        return self._link(file_no, state)
+
+    def _load_all(self, workers=1):
+        '''Load all files, parsing files in parallel processes
+
+        In the parse phase, every file without a snapshot is parsed
+        on its own, into columns that are cheap to pass between processes.
+        In the link phase, the tables are built and the foreign keys
+        are indexed.
+        '''
+        if self._source is not None:
+            for file_no in range(len(SedraIII.files)):
+                self._load(file_no)
+            return
+        states = [self._read_snapshot(name) for name in SedraIII.files]
+        missing = [name for name, state in zip(SedraIII.files, states)
+                   if state is None]
+        if workers is None:
+            workers = min(len(missing), os.cpu_count() or 1)
+        with instrument.timer('sedra_parse_phase_seconds'):
+            if len(missing) > 1 and workers > 1:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(workers) as pool:
+                    parsed = dict(zip(missing, pool.map(
+                        parse_db_file, [self._db_dir] * len(missing), missing)))
+            else:
+                parsed = dict((name, parse_db_file(self._db_dir, name))
+                              for name in missing)
+        for file_no, name in enumerate(SedraIII.files):
+            state = states[file_no]
+            if state is None:
+                state = parsed[name]
+                self._write_snapshot(name, state)
+            self._link(file_no, state)
+
+    def _read_snapshot(self, name):
+        # a snapshot of a previous load is used if the file is unchanged
+        if not self._cache:
+            return None
+        return read_snapshot(snapshot_path(name, self._db_dir),
+                             self._db_dir, [CFG_ITEMS[name]])
+
+    def _write_snapshot(self, name, state):
+        if self._cache:
+            write_snapshot(snapshot_path(name, self._db_dir),
+                           self._db_dir, [CFG_ITEMS[name]], state)
+
+    def _link(self, file_no, state):
+        '''Build table of file_no from parsed columns, and index it'''
+        name, db_class = SedraIII.db_classes[file_no]
+        with instrument.timer('sedra_link_seconds', file=name):
+            columns = [restore_column(c) for c in state]
+            table = Table(self, file_no, name, db_class, columns, self._tr)
+            if not self._lazy:
+                # decode all distinct values of the bit field columns at once
+                for prop in vars(db_class).values():
+                    if isinstance(prop, BitFieldColumn):
+                        prop.decode_column(getattr(table, prop.name))
+            for index_file, key in SedraIII.indexes:
+                if index_file == name:
+                    self._indexes[(name, key)] = make_index(table, key)
+        instrument.add('sedra_records_total', len(table), file=name)
+        return self._add_table(table)
+
+
+def parse_db_file(db_dir, name):
+    '''Parse SEDRA file name into a tuple of column states'''
+    # this runs in worker processes, so only returns compact picklable data
+    db_class = SedraIII.classes[SedraIII.files.index(name)]
+    with instrument.timer('sedra_parse_seconds', file=name):
+        rows = [db_class._parse(line)
+                for line in read_db_file(db_dir, CFG_ITEMS[name])]
+    columns = zip(*rows) if rows else [()] * len(db_class._columns)
+    return tuple(get_column_state(make_column(column)) for column in columns)
+
+
+class Registry(object):
+    '''Shared SedraIII databases, by data directory and transcription
+
+    Every database is loaded only once per data directory, in SEDRA
+    transcription. Other transcriptions are views on that database.
+    A database is kept until it has been released as often as it has
+    been requested, or until the registry is cleared.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bases = {}    # db_dir: SedraIII in SEDRA transcription
+        self._entries = {}  # (db_dir, tr_name): [SedraIII, use count]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, db):
+        '''Test if database db is held by the registry'''
+        with self._lock:
+            return any(entry[0] is db for entry in self._entries.values())
+
+    def _key(self, tr, db_dir):
+        db_dir = os.path.abspath(DB_DIR if db_dir is None else db_dir)
+        return (db_dir, tr_name(tr))
+
+    def get(self, tr=towit, db_dir=None, cache=True, lazy=False):
+        '''Get shared database in transcription tr'''
+        key = self._key(tr, db_dir)
+        with self._lock:
+            try:
+                entry = self._entries[key]
+            except KeyError:
+                base = self._bases.get(key[0])
+                if base is None:
+                    base = self._bases[key[0]] = SedraIII(
+                        tr=None, cache=cache, lazy=lazy, db_dir=key[0])
+                db = base if tr is None else base.transcribed(tr)
+                entry = self._entries[key] = [db, 0]
+            db = entry[0]
+            if not lazy:
+                # an earlier user may have asked for a lazy database
+                for file_no in range(len(SedraIII.files)):
+                    db.get_table(file_no)
+            entry[1] += 1
+            return db
+
+    def release(self, db):
+        '''Stop using db; it is dropped once no user is left'''
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry[0] is db:
+                    break
+            else:
+                raise KeyError('database not in registry')
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._entries[key]
+                if not any(k[0] == key[0] for k in self._entries):
+                    del self._bases[key[0]]
+
+    def clear(self):
+        '''Drop all databases, whether they are in use or not'''
+        with self._lock:
+            self._entries.clear()
+            self._bases.clear()
+
+# databases shared by all BFBS texts in the process
+registry = Registry()
+
+
+class NTWord(Record):
+    # example input line: 0:6,520100106,33558659,24
 
+    __slots__ = ()
+    Location = namedtuple('Location',
+                    ['book_name', 'book_id', 'chapter', 'verse', 'w_num'])
 
-    def _import_db(self, file_no, name, db_class):
-        addr_dict = {}
-        db = []
-        for line in read_db_file(DB_DIR, CFG_ITEMS[name]):
-            e = db_class(line, file_no, name, self)
-            addr_dict[e.id] = e
-            db.append(e)
-        return (addr_dict, tuple(db))
+    def __str__(self):
+        return self.word.__str__()
 
+    @property
+    def id(self):
+        # rec_addr is not unique, so the location id is used as identifier
+        return int(self._table.columns['loc_id'][self._row])
 
-class NTWord:
-    # example input line: 0:6,520100106,33558659,24
+    @property
+    def location(self):
+        c, r = self._table.columns, self._row
+        book_id = int(c['book_id'][r])
+        return NTWord.Location(NT_BOOKS[book_id-NT_OFFSET][0], book_id,
+                               int(c['chapter'][r]), int(c['verse'][r]),
+                               int(c['w_num'][r]))
 
-    Location = namedtuple('Location',
-                    ['book_name', 'book_id', 'chapter', 'verse', 'w_num'])
+    @property
+    def word_addr(self):
+        return (2, self._word_id) # e.g. (2,1)
 
-    def __init__(self, line, db):
-        self.db = db
-        # self.rec_addr = line[0]  # rec_addr is not unique, so useless as id
-        self.id = int(line[1]) # use location id as identifier instead
-        self.location = NTWord.Location(*self._get_location(line[1]))
-        self.word_addr = self._get_word_addr(line[2]) # tuple, e.g. (2,1)
-        self.attr = int(line[3])
-        self.attributes = self.attr # TODO find attribute description
-        self.attr_bits = '{0:016b}'.format(self.attr) # for easier inspection
-        # shortcuts to db object attributes
-        self.word = db.get(self.word_addr)
-        self.lexeme = self.word.lexeme
-        self.root = self.word.root
-        self.cons_str = self.word.cons_str
+    @property
+    def _word_id(self):
+        return int(self._table.columns['word_id'][self._row])
 
-    def __repr__(self):
-        return get_identifier(self)
+    @property
+    def attr(self):
+        return int(self._table.columns['attr'][self._row])
 
-    def __str__(self):
-        return self.word.__str__()
+    @property
+    def attributes(self):
+        return self.attr # TODO find attribute description
 
-    def _get_word_addr(self, a):
-        # word_addr is a crazy encoded decimal value of two combined
-        # hexadecimal values, the first of which is always '02'
-        # (the number of the WORDS.TXT file). So to retrieve
-        # the word_id, we must convert word_addr to a hex string
-        # of eight positions, and convert the rightmost six back
-        # to decimal. The leftmost two will always be '02'.
-        h = '{0:08x}'.format(int(a))
-        return (int(h[:2], 16), int(h[2:], 16))
+    @property
+    def attr_bits(self):
+        return '{0:016b}'.format(self.attr) # for easier inspection
 
-    def _get_location(self, s):
-        loc_id = tuple(int(e) for e in (s[:2], s[2:4], s[4:7], s[7:]))
-        book_name = NT_BOOKS[loc_id[0]-NT_OFFSET][0]
-        return (book_name,) + loc_id
+    # shortcuts to db object attributes
+    @property
+    def word(self):
+        return self._table.db.words.get(self._word_id)
 
+    @property
+    def lexeme(self):
+        return self.word.lexeme
 
-class BFBS:
+    @property
+    def root(self):
+        return self.word.root
 
-    def __init__(self, tr = towit, db = None):
-        if db == None:
-            db = SedraIII(tr=tr)
+    @property
+    def cons_str(self):
+        return self.word.cons_str
+
+
+def split_nt_columns(loc_id, word_addr, attr):
+    '''Get columns of BFBS tokens from sorted numpy arrays of fields'''
+    # the location id consists of book (2 digits), chapter (2),
+    # verse (3) and word (2), e.g. 520100106
+    book_id = (loc_id // 10000000).astype(np.int16)
+    chapter = (loc_id // 100000 % 100).astype(np.int16)
+    verse = (loc_id // 100 % 1000).astype(np.int16)
+    w_num = (loc_id % 100).astype(np.int16)
+    # word_addr is a crazy encoded decimal value of two combined
+    # hexadecimal values, the first of which is always '02'
+    # (the number of the WORDS.TXT file). So the word_id is
+    # in the rightmost 24 bits, and the leftmost 8 are always 2.
+    word_id = (word_addr & 0xFFFFFF).astype(np.int32)
+    return [loc_id, book_id, chapter, verse, w_num, word_id, attr]
+
+def get_verse_label(columns, r):
+    '''Get label (book_name, book_id, chapter, verse) of token in row r'''
+    book_id = int(columns['book_id'][r])
+    return (NT_BOOKS[book_id-NT_OFFSET][0], book_id,
+            int(columns['chapter'][r]), int(columns['verse'][r]))
+
+def read_nt_offsets(db_dir, filename):
+    '''Get location ids and byte offsets of all tokens of the NT file,
+    sorted by location id'''
+    loc_ids, offsets = array('i'), array('q')
+    offset = 0
+    with open(os.path.join(db_dir, filename), 'rb') as f:
+        for line in f:
+            fields = line.split(b',', 2)
+            if len(fields) > 2:
+                loc_ids.append(int(fields[1]))
+                offsets.append(offset)
+            offset += len(line)
+    loc_id = np.array(loc_ids, dtype=np.int32)
+    order = np.argsort(loc_id, kind='stable')
+    return loc_id[order], np.array(offsets, dtype=np.int64)[order]
+
+
+class Tokens(View):
+    '''View on tokens of the BFBS text, see views.View'''
+
+    word_class = NTWord
+
+    def column(self, name):
+        '''Get numpy array of column name for these tokens, which is
+        a view on the column if the tokens are one range'''
+        column = self.text.columns[name]
+        parts = [column[p.start:p.stop:p.step] if isinstance(p, range)
+                 else column[np.asarray(p)] for p in self.rows.parts]
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else column[:0]
+
+
+class StreamedVerse(object):
+    '''Columns of the tokens of one verse, read from the NT file'''
+
+    __slots__ = ('db', 'columns')
+
+    def __init__(self, db, columns):
         self.db = db
-        self.nt = self._read_nt_file()
+        self.columns = columns
+
+
+class BFBS(References):
+
+    # columns of the text, sorted by location id
+    column_names = ('loc_id', 'book_id', 'chapter', 'verse', 'w_num',
+                    'word_id', 'attr')
+
+    def __init__(self, tr = towit, db = None, cache = True, lazy = False,
+                 shared = True, source = None):
+        '''Load the BFBS text
+
+        Unless a db is given, the SEDRA database is taken from the
+        registry, so that all texts share the same database. With
+        shared=False, a private database is loaded instead.
+        If a source is given (e.g. sqlitedb.SQLiteSource), the text is
+        read from that instead of the text file, and the database as
+        well if the source holds it.
+        '''
+        self._registered = False
+        self._source = source
+        if db is None:
+            if getattr(source, 'read_table', None) is not None:
+                # the source holds the SEDRA database as well
+                db = SedraIII(tr=tr, lazy=lazy, source=source)
+            elif shared:
+                db = registry.get(tr, cache=cache, lazy=lazy)
+                self._registered = True
+            else:
+                db = SedraIII(tr=tr, cache=cache, lazy=lazy)
+        self.db = db
+        self._cache = cache
+        self._references = None
+        if not lazy:
+            self._load()
+
+    def __getattr__(self, name):
+        # with lazy=True, the text is only read on first access
+        if name in ('columns', 'nt', 'verse_offsets'):
+            self._load()
+            return getattr(self, name)
+        raise AttributeError(name)
 
     def __getitem__(self, key):
         return self.nt[key]
 
+    def __len__(self):
+        return len(self.nt)
+
+    def __iter__(self):
+        return iter(self.nt)
+
+    def _load(self):
+        if self._source is not None:
+            self._set_columns(self._source.read_bfbs())
+            return
+        # the snapshot holds no transcribed strings, so is the same for all
+        path = snapshot_path('bfbs')
+        state = read_snapshot(path, DB_DIR, [NT_FILE]) if self._cache else None
+        if state is None:
+            columns = self._read_nt_file()
+            if self._cache:
+                write_snapshot(path, DB_DIR, [NT_FILE],
+                    tuple((c.dtype.str, c.tobytes()) for c in columns))
+        else:
+            columns = [np.frombuffer(data, dtype) for dtype, data in state]
+        self._set_columns(columns)
+
+    def _set_columns(self, columns):
+        self.columns = dict(zip(BFBS.column_names, columns))
+        # offsets of the first token of every verse, and of the end
+        verse_ids = self.columns['loc_id'] // 100
+        starts = np.flatnonzero(verse_ids[1:] != verse_ids[:-1]) + 1
+        self.verse_offsets = np.concatenate(([0], starts, [len(verse_ids)]))
+        self.nt = Tokens(self, range(len(verse_ids)))
+
     def _read_nt_file(self):
-        nt = []
-        for line in read_db_file(DB_DIR, NT_FILE):
-            nt.append(NTWord(line, self.db))
-        # since source file is not sorted properly, need to sort list first
-        nt.sort(key=lambda w: w.id)
-        return tuple(nt)
+        with instrument.timer('bfbs_parse_seconds'):
+            lines = list(read_db_file(DB_DIR, NT_FILE))
+            loc_id = np.array([int(line[1]) for line in lines], dtype=np.int32)
+            word_addr = np.array([int(line[2]) for line in lines],
+                                 dtype=np.int64)
+            attr = np.array([int(line[3]) for line in lines], dtype=np.int32)
+        instrument.add('bfbs_tokens_total', len(lines))
+        with instrument.timer('bfbs_sort_seconds'):
+            # since source file is not sorted properly, need to sort first
+            order = np.argsort(loc_id, kind='stable')
+            return split_nt_columns(loc_id[order], word_addr[order],
+                                    attr[order])
+
+    def _nt_offsets(self):
+        '''Get sorted location ids and byte offsets of the NT file'''
+        # the offsets are stored in a sidecar file next to the snapshots
+        path = snapshot_path('bfbs-offsets')
+        state = read_snapshot(path, DB_DIR, [NT_FILE]) if self._cache else None
+        if state is None:
+            columns = read_nt_offsets(DB_DIR, NT_FILE)
+            if self._cache:
+                write_snapshot(path, DB_DIR, [NT_FILE],
+                    tuple((c.dtype.str, c.tobytes()) for c in columns))
+        else:
+            columns = [np.frombuffer(data, dtype) for dtype, data in state]
+        return columns
+
+    def close(self):
+        '''Release the shared SEDRA database'''
+        if self._registered:
+            self._registered = False
+            registry.release(self.db)
+
+    def transcribed(self, tr):
+        '''Get view on this text in transcription tr, sharing all data'''
+        self.columns    # make sure the text is loaded
+        other = BFBS.__new__(BFBS)
+        other.__dict__.update(self.__dict__)
+        other.db = self.db.transcribed(tr)
+        other._registered = False
+        other.nt = Tokens(other, self.nt.rows)
+        return other
+
+    def verse_label(self, i):
+        '''Get label (book_name, book_id, chapter, verse) of verse i'''
+        return get_verse_label(self.columns, self.verse_offsets[i])
 
     def verses(self, label = False):
-        verse = []
-        verse_label = self.nt[0].location[:4]
-        for word in self.nt:
-            if word.location[:4] != verse_label:
-                yield (verse_label, verse) if label else verse
-                verse = []
-                verse_label = word.location[:4]
-            verse.append(word)
-        yield (verse_label, verse) if label else verse
+        offsets = self.verse_offsets.tolist()
+        for i in range(len(offsets) - 1):
+            verse = Tokens(self, range(offsets[i], offsets[i+1]))
+            yield (self.verse_label(i), verse) if label else verse
+
+    def stream_verses(self, label = False):
+        '''Read verses one by one from the NT file, in canonical order
+
+        Unlike verses(), this does not load the whole text: only the
+        byte offsets of the tokens, which are kept in a sidecar file.
+        '''
+        loc_id, offsets = self._nt_offsets()
+        verse_ids = loc_id // 100
+        bounds = np.flatnonzero(verse_ids[1:] != verse_ids[:-1]) + 1
+        bounds = [0] + bounds.tolist() + [len(loc_id)]
+        with open(os.path.join(DB_DIR, NT_FILE), 'rb') as f:
+            for start, stop in zip(bounds[:-1], bounds[1:]):
+                lines = []
+                for offset in offsets[start:stop].tolist():
+                    f.seek(offset)
+                    lines.append(f.readline().split(b','))
+                word_addr = np.array([int(l[2]) for l in lines], dtype=np.int64)
+                attr = np.array([int(l[3]) for l in lines], dtype=np.int32)
+                columns = split_nt_columns(loc_id[start:stop], word_addr, attr)
+                verse = StreamedVerse(self.db,
+                                      dict(zip(BFBS.column_names, columns)))
+                tokens = Tokens(verse, range(stop - start))
+                yield (get_verse_label(verse.columns, 0), tokens) \
+                    if label else tokens
 
     def words(self):
-        for w in self.nt:
-            yield w
+        return iter(self.nt)
 
-    def printlines(self):
+    def printlines(self, stream = False):
+        '''Yield lines of text, with stream=True without loading the text'''
+        verses = self.stream_verses if stream else self.verses
         pl = None # pl: previous label
-        for l, v in self.verses(label=True):
+        for l, v in verses(label=True):
             if pl is None or pl[1] != l[1] or pl[2] != l[2]:
                 if pl is not None:  # no newline before first chapter
                     yield ''
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Store the SEDRA database and the NT texts in an SQLite file
+
+export() writes the five SEDRA files, with their attributes and features
+decoded into separate columns, and the BFBS and SyrNT texts into one
+SQLite file, with indexes on ids, addresses, location ids and lexemes.
+All strings are stored in SEDRA transcription.
+
+SedraIII, BFBS and SyrNT can be loaded from such a file instead of from
+the text files, by passing an SQLiteSource:
+
+    source = SQLiteSource('linksyr.sqlite')
+    nt = sedra.BFBS(source=source)
+    syr = syrnt.SyrNT(source=source)
+
+The file is only opened read-only, through a pool of connections per
+process, so that any number of processes can read the same file. Note
+that the loaders copy whole tables into the columns of the loaded
+objects, so every process that loads a text holds its own copy in
+memory; only queries run against the shared (page-cached) file. The
+pool can also be used for ad hoc SQL:
+
+    source.query('SELECT lex_str, COUNT(*) FROM bfbs '
+                  'JOIN words ON words.id = bfbs.word_id '
+                  'JOIN lexemes ON lexemes.id = words.lex_addr '
+                  'GROUP BY lex_str ORDER BY 2 DESC LIMIT 10')
+"""
+
+from __future__ import unicode_literals, print_function
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from array import array
+import numpy as np
+
+import sedra
+import syrnt
+from constants import SyrNT as c
+
+FORMAT_VERSION = '1'
+
+# indexes on addresses, location ids and lexemes; ids are primary keys
+INDEXES = (('lexemes',   'root_addr'),
+           ('lexemes',   'lex_str'),
+           ('roots',     'rt_str'),
+           ('words',     'lex_addr'),
+           ('words',     'cons_str'),
+           ('english',   'lex_addr'),
+           ('etymology', 'lex_addr'),
+           ('bfbs',      'loc_id'),
+           ('bfbs',      'word_id'),
+           ('syrnt',     'loc_id'),
+           ('syrnt',     'lexeme'),
+           ('syrnt',     'root'))
+
+SYRNT_FIELDS = tuple(f[0].replace(' ', '_') for f in c.ANNOTATIONS)
+
+
+def bit_field_columns(record_class):
+    '''Get list of (property, field, column name) of decoded bit fields'''
+    result = []
+    for prop in ('attributes', 'features'):
+        nt = getattr(record_class, prop.capitalize(), None)
+        if nt is not None and hasattr(record_class, prop):
+            result.extend((prop, f, '{0}_{1}'.format(prop, f))
+                          for f in nt._fields)
+    return result
+
+def export_sedra(conn, db):
+    # store strings in SEDRA transcription
+    db = db.transcribed(None)
+    for file_no, (name, record_class) in enumerate(sedra.SedraIII.db_classes):
+        table = db.get_table(file_no)
+        columns = list(record_class._columns)
+        decoded = bit_field_columns(record_class)
+        names = columns + [d[2] for d in decoded]
+        conn.execute('CREATE TABLE {0} ({1} INTEGER PRIMARY KEY, {2})'.format(
+            name, columns[0], ', '.join(names[1:])))
+        data = [table.column(key) for key in columns]
+        for prop, field, column in decoded:
+            data.append([getattr(getattr(r, prop), field) for r in table])
+        conn.executemany('INSERT INTO {0} VALUES ({1})'.format(
+            name, ', '.join('?' * len(names))), zip(*data))
+
+def export_bfbs(conn, bfbs):
+    names = ('pos',) + sedra.BFBS.column_names
+    conn.execute('CREATE TABLE bfbs (pos INTEGER PRIMARY KEY, {0})'.format(
+        ', '.join(names[1:])))
+    data = [range(len(bfbs))] + [bfbs.columns[k].tolist()
+                                 for k in sedra.BFBS.column_names]
+    conn.executemany('INSERT INTO bfbs VALUES ({0})'.format(
+        ', '.join('?' * len(names))), zip(*data))
+
+def export_syrnt(conn, text):
+    conn.execute('CREATE TABLE syrnt_verses (verse_no INTEGER PRIMARY KEY, '
+                 'book_name, book_id, chapter, verse, start, stop)')
+    offsets = text.verse_offsets
+    conn.executemany('INSERT INTO syrnt_verses VALUES (?, ?, ?, ?, ?, ?, ?)',
+        [(i,) + tuple(l) + (offsets[i], offsets[i+1])
+         for i, l in enumerate(text._verse_labels)])
+    conn.execute('CREATE TABLE syrnt (pos INTEGER PRIMARY KEY, loc_id, '
+                 'verse_no, w_num, cons_str, {0})'.format(
+                     ', '.join(SYRNT_FIELDS)))
+    rows = []
+    for i, l in enumerate(text._verse_labels):
+        for pos in range(offsets[i], offsets[i+1]):
+            w_num = pos - offsets[i] + 1
+            loc_id = ((l[1] * 100 + l[2]) * 1000 + l[3]) * 100 + w_num
+            rows.append((pos, loc_id, i, w_num, text._forms[pos]) +
+                        tuple(text._annotations[pos]))
+    conn.executemany('INSERT INTO syrnt VALUES ({0})'.format(
+        ', '.join('?' * (5 + len(SYRNT_FIELDS)))), rows)
+    # labels of coded annotation fields, for ad hoc queries
+    conn.execute('CREATE TABLE syrnt_labels (field, code, label, '
+                 'PRIMARY KEY (field, code))')
+    conn.executemany('INSERT INTO syrnt_labels VALUES (?, ?, ?)',
+        [(f, code, label)
+         for f, (name, labels) in zip(SYRNT_FIELDS, c.ANNOTATIONS) if labels
+         for code, label in enumerate(labels)])
+
+def export(path, db=None, bfbs=None, syrnt_text=None):
+    '''Write SEDRA database and NT texts to a new SQLite file at path
+
+    Without db, the database of bfbs (or else a new one) is exported.
+    The texts (sedra.BFBS and syrnt.SyrNT) are only exported if given.
+    '''
+    if db is None:
+        db = bfbs.db if bfbs is not None else sedra.SedraIII()
+    tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        with conn:
+            conn.execute('CREATE TABLE meta (key PRIMARY KEY, value)')
+            conn.execute("INSERT INTO meta VALUES ('version', ?)",
+                         (FORMAT_VERSION,))
+            export_sedra(conn, db)
+            if bfbs is not None:
+                export_bfbs(conn, bfbs)
+            if syrnt_text is not None:
+                export_syrnt(conn, syrnt_text)
+            for table, column in INDEXES:
+                exists = conn.execute("SELECT 1 FROM sqlite_master WHERE "
+                    "type = 'table' AND name = ?", (table,)).fetchone()
+                if exists:
+                    conn.execute('CREATE INDEX {0}_{1} ON {0} ({1})'.format(
+                        table, column))
+        conn.execute('ANALYZE')
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+
+class ConnectionPool:
+    '''Pool of read-only connections to an SQLite file, per process'''
+
+    def __init__(self, path, size=4):
+        self.uri = 'file:{0}?mode=ro'.format(os.path.abspath(path))
+        self.size = size
+        self._lock = threading.Lock()
+        self._idle = []
+        self._pid = os.getpid()
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # connections must not be shared with a parent process
+                self._idle, self._pid = [], os.getpid()
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close(self):
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle = []
+
+
+class SQLiteSource:
+    '''Source of SedraIII, BFBS and SyrNT data in an SQLite file'''
+
+    def __init__(self, path, pool_size=4):
+        if not os.path.exists(path):
+            raise IOError('No such file: {0}'.format(path))
+        self.path = path
+        self.pool = ConnectionPool(path, pool_size)
+
+    def query(self, sql, parameters=()):
+        '''Get list of result rows of an SQL query'''
+        with self.pool.connection() as conn:
+            return conn.execute(sql, parameters).fetchall()
+
+    def read_table(self, name):
+        '''Get column states of SEDRA file name, as used by SedraIII'''
+        record_class = dict(sedra.SedraIII.db_classes)[name]
+        columns = record_class._columns
+        rows = self.query('SELECT {0} FROM {1} ORDER BY {2}'.format(
+            ', '.join(columns), name, columns[0]))
+        if not rows:
+            return tuple((None, ()) for column in columns)
+        return tuple(sedra.get_column_state(sedra.make_column(column))
+                     for column in zip(*rows))
+
+    def read_bfbs(self):
+        '''Get columns of the BFBS text, as used by BFBS'''
+        with self.pool.connection() as conn:
+            rows = conn.execute('SELECT loc_id, word_id, attr FROM bfbs '
+                                'ORDER BY pos').fetchall()
+        loc_id, word_id, attr = (zip(*rows) if rows else ((), (), ()))
+        return sedra.split_nt_columns(np.array(loc_id, dtype=np.int32),
+                                      np.array(word_id, dtype=np.int64),
+                                      np.array(attr, dtype=np.int32))
+
+    def read_syrnt(self):
+        '''Get forms, annotations, verse labels and offsets of SyrNT'''
+        verses = self.query('SELECT book_name, book_id, chapter, verse, start '
+                            'FROM syrnt_verses ORDER BY verse_no')
+        rows = self.query('SELECT cons_str, {0} FROM syrnt '
+                          'ORDER BY pos'.format(', '.join(SYRNT_FIELDS)))
+        # forms and annotations repeat a lot, so are stored as types
+        forms = syrnt.make_types(r[0] for r in rows)
+        annotations = syrnt.make_types(r[1:] for r in rows)
+        labels = [tuple(v[:4]) for v in verses]
+        offsets = array('i', [v[4] for v in verses] + [len(rows)])
+        return forms, annotations, labels, offsets
+
+    def close(self):
+        self.pool.close()
@@ -1,12 +1,18 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-# now it works in python 2.6 and 3.x!
 from __future__ import unicode_literals, print_function
 
+import io
 import os.path
-from collections import namedtuple
-from constants import NT_BOOKS, SyrNT as c
+from array import array
+from collections import namedtuple, OrderedDict
+from itertools import islice, repeat
+from numbers import Integral
+from sys import intern
+from constants import NT_BOOKS, NT_OFFSET, SyrNT as c
+from references import ReferenceIndex, References
+from views import View
 
 # Read database location from config file
 try: # allow for different module names in python 2 and 3
@@ -19,39 +25,137 @@ config.read('linksyr.conf')
 datadir = config.get('syrnt','datadir')
 filename = config.get('syrnt','filename')
 dbpath = os.path.join(datadir, filename)
-NT_OFFSET = 52  # starting id of NT books
-
-# TODO check discrepancies between SEDRA and Syromorph NT.
-# It seems that
-# 521601715
-# 550104214
-# 562103016
-# 562302606
-# 580201122
-# 781901718
-# 782202101
-# 782202102
-# 782202103
-# 782202104
-# 782202105
-# 782202106
-# 782202107
-# 782202108
+
+# Discrepancies between SEDRA and Syromorph NT, e.g. the missing words
+# of Rev 22:21 (782202101-782202108), are listed by alignment.Alignment.
 
 # helper functions
 
-def read_db_file():
+def read_db_file(path=None):
     from io import open # This is for python 2.6
-    with open(dbpath) as f:
+    with open(dbpath if path is None else path) as f:
         for line in f:
             yield line
 
+def parse_annotation(a_str):
+    '''Parse annotation string into tuple, with ints for digit fields'''
+    return tuple(int(v) if v.isdigit() else intern(v)
+                 for v in a_str.split('#'))
+
 def get_verse_labels():
     for book_id, (book_name, chapters) in enumerate(NT_BOOKS, NT_OFFSET):
         for chapter, versecount in enumerate(chapters, 1):
             for verse in range(1, versecount + 1):
                 yield (book_name, book_id, chapter, verse)
 
+# parsed lines of the Syromorph file, with type ids local to the chunk
+Chunk = namedtuple('Chunk', ['forms', 'form_ids', 'ann_strings',
+                             'annotations', 'ann_ids',
+                             'verse_labels', 'verse_offsets'])
+
+def parse_lines(lines, labels):
+    '''Parse lines of the Syromorph file, zipped with their verse labels,
+    into a Chunk'''
+    forms, form_ids = [], array('I')
+    ann_strings, annotations, ann_ids = [], [], array('I')
+    verse_labels, verse_offsets = [], array('I', [0])
+    # type ids of every distinct word, form and annotation string
+    words, form_index, ann_index = {}, {}, {}
+    for verse_label, line in zip(labels, lines):
+        for w_str in line.split():
+            try:
+                f, a = words[w_str]
+            except KeyError:
+                # every distinct string is parsed only once
+                cons_str, a_str = w_str.split('|')
+                f = form_index.get(cons_str)
+                if f is None:
+                    f = form_index[cons_str] = len(forms)
+                    forms.append(intern(cons_str))
+                a = ann_index.get(a_str)
+                if a is None:
+                    a = ann_index[a_str] = len(annotations)
+                    ann_strings.append(a_str)
+                    annotations.append(parse_annotation(a_str))
+                words[w_str] = f, a
+            form_ids.append(f)
+            ann_ids.append(a)
+        verse_labels.append(verse_label)
+        verse_offsets.append(len(form_ids))
+    return Chunk(forms, form_ids, ann_strings, annotations, ann_ids,
+                 verse_labels, verse_offsets)
+
+def chunk_bounds(path, n):
+    '''Split file at path into at most n chunks of whole lines, and get
+    list of (start, stop) byte offsets of all chunks'''
+    size = os.path.getsize(path)
+    bounds = []
+    start = 0
+    with open(path, 'rb') as f:
+        for i in range(1, n + 1):
+            if i < n:
+                # the chunk ends at the end of the line at its nominal end
+                f.seek(max(i * size // n, start))
+                f.readline()
+                stop = f.tell()
+            else:
+                stop = size
+            if stop > start:
+                bounds.append((start, stop))
+                start = stop
+    return bounds
+
+def parse_chunk(path, start, stop):
+    '''Parse lines in bytes start to stop of the Syromorph file, without
+    verse labels'''
+    # this runs in worker processes, so only returns compact picklable data
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(stop - start)
+    return parse_lines(io.TextIOWrapper(io.BytesIO(data)), repeat(None))
+
+def label_verses(chunk):
+    '''Get Chunk with the verse labels of its lines, which follow from the
+    line number (see get_verse_labels)'''
+    labels = list(islice(get_verse_labels(), len(chunk.verse_labels)))
+    # lines after the last verse are left out, as by parse_lines()
+    stop = chunk.verse_offsets[len(labels)]
+    return chunk._replace(form_ids=chunk.form_ids[:stop],
+                          ann_ids=chunk.ann_ids[:stop], verse_labels=labels,
+                          verse_offsets=chunk.verse_offsets[:len(labels) + 1])
+
+def merge_chunks(chunks):
+    '''Merge consecutive Chunks into one, with the same types and type ids
+    as parsing all lines at once would give'''
+    if len(chunks) == 1:
+        return chunks[0]
+    result = Chunk([], array('I'), [], [], array('I'), [], array('I', [0]))
+    form_index, ann_index = {}, {}
+    for chunk in chunks:
+        # map type ids of the chunk to type ids of the result
+        form_map = []
+        for form in chunk.forms:
+            f = form_index.get(form)
+            if f is None:
+                f = form_index[form] = len(result.forms)
+                result.forms.append(intern(form))
+            form_map.append(f)
+        ann_map = []
+        for a_str, annotation in zip(chunk.ann_strings, chunk.annotations):
+            a = ann_index.get(a_str)
+            if a is None:
+                a = ann_index[a_str] = len(result.annotations)
+                result.ann_strings.append(a_str)
+                result.annotations.append(annotation)
+            ann_map.append(a)
+        offset = result.verse_offsets[-1]
+        result.form_ids.extend([form_map[f] for f in chunk.form_ids])
+        result.ann_ids.extend([ann_map[a] for a in chunk.ann_ids])
+        result.verse_labels.extend(chunk.verse_labels)
+        result.verse_offsets.extend([offset + o
+                                     for o in chunk.verse_offsets[1:]])
+    return result
+
 def maketrans(s1, s2):
     '''Make a simple translation table'''
     # There are more sophisticated maketrans-functions (str.maketrans()
@@ -72,32 +176,142 @@ def supertag(w):
     return '+'.join([e for e in (w.prefix, w.postag, w.suffix) if e])
 
 
-# class NTWord
+class Types(object):
+    '''Values of all words, stored as a table of distinct values (types)
+    and the type id of every word'''
+
+    __slots__ = ('types', 'ids')
 
-class NTWord:
+    def __init__(self, types, ids):
+        self.types = types  # any sequence, e.g. list of strings
+        self.ids = ids      # any sequence of int, e.g. array or numpy array
 
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        return self.types[self.ids[i]]
+
+    def __iter__(self):
+        types = self.types
+        return (types[i] for i in self.ids)
+
+    def column(self, f):
+        '''Get list of f(value) for all words, calling f once per type'''
+        values = [f(v) for v in self.types]
+        return [values[i] for i in self.ids]
+
+def make_types(values):
+    '''Get Types of a sequence of hashable values'''
+    if isinstance(values, Types):
+        return values
+    index = {}
+    types = []
+    ids = array('I')
+    for v in values:
+        try:
+            ids.append(index[v])
+        except KeyError:
+            ids.append(index.setdefault(v, len(types)))
+            types.append(v)
+    return Types(types, ids)
+
+
+class Packing(object):
+    '''Packing of the coded annotation fields (those with labels) into
+    the bits of one integer, starting at the lowest bit, with just enough
+    bits for the labels of every field'''
+
+    def __init__(self, fields=c.ANNOTATIONS):
+        self.fields = OrderedDict() # name -> (index, shift, mask, labels)
+        shift = 0
+        for i, (f_name, f_values) in enumerate(fields):
+            if f_values:
+                bits = (len(f_values) - 1).bit_length()
+                self.fields[f_name.replace(' ', '_')] = (
+                    i, shift, (1 << bits) - 1, f_values)
+                shift += bits
+        self.bits = shift   # 38 bits for the Syromorph fields
+
+    def pack(self, annotation):
+        '''Get integer of the coded fields of an annotation tuple'''
+        n = 0
+        for i, s, m, v in self.fields.values():
+            if not 0 <= annotation[i] <= m:
+                raise ValueError('Invalid code {0} in annotation {1}'.format(
+                    annotation[i], annotation))
+            n |= annotation[i] << s
+        return n
+
+    def field(self, name):
+        '''Get (index, shift, mask, labels) of coded field name'''
+        try:
+            return self.fields[name]
+        except KeyError:
+            raise ValueError('Not a coded annotation field: {0}'.format(name))
+
+    def code(self, name, value):
+        '''Get code of field name for a label or a code (any integer,
+        e.g. from numpy, but not a bool)'''
+        labels = self.field(name)[3]
+        if isinstance(value, Integral) and not isinstance(value, bool):
+            if 0 <= value < len(labels):
+                return int(value)
+        elif isinstance(value, str) and value in labels:
+            return labels.index(value)
+        raise ValueError('Invalid value of {0}: {1}'.format(name, value))
+
+packing = Packing()
+
+
+# class NTWord
+
+class Transcriber:
+    '''Render strings in SEDRA transcription in transcription tr'''
+
+    def __init__(self, tr, annotations):
+        self.tr = tr
+        # source annotations, as Types
+        self._types = annotations.types
+        self._ids = annotations.ids
+        # every distinct string or annotation is rendered only once
+        self._strings = {}
+        self._annotations = [None] * len(self._types)   # by type id
+
+    def string(self, s):
+        if self.tr is None:
+            return s
+        try:
+            return self._strings[s]
+        except KeyError:
+            result = self._strings[s] = s.translate(self.tr)
+            return result
+
+    def annotation(self, row):
+        '''Get annotation and annotation values of the word in row'''
+        t = self._ids[row]
+        result = self._annotations[t]
+        if result is None:
+            annotation = NTWord.Annotation(*[v if isinstance(v, int)
+                            else self.string(v) for v in self._types[t]])
+            ann_values = NTWord.Annotation(*[f[1][v] if f[1] else v
+                            for f, v in zip(c.ANNOTATIONS, annotation)])
+            result = self._annotations[t] = (annotation, ann_values)
+        return result
+
+
+class NTWord(object):
+    '''View on a word of a SyrNT text'''
+
+    __slots__ = ('_text', '_row')
     Annotation = namedtuple('Annotation',
                     [f[0].replace(' ','_') for f in c.ANNOTATIONS])
     Location = namedtuple('Location',
                     ['book_name', 'book_id', 'chapter', 'verse', 'w_num'])
 
-    def __init__(self, w_str, location, tr):
-        if tr is not None:
-            w_str = w_str.translate(tr)
-        self.cons_str, a_str = w_str.split('|')
-        self.location = NTWord.Location(*location)
-        self.annotation = NTWord.Annotation(*[int(v) if v.isdigit() else v
-                            for v in a_str.split('#')])
-        self.ann_values = NTWord.Annotation(*[f[1][v] if f[1] else v
-                            for f, v in zip(c.ANNOTATIONS, self.annotation)])
-        # some shortcuts:
-        self.stem   = self.ann_values.stem
-        self.lexeme = self.ann_values.lexeme
-        self.root   = self.ann_values.root
-        self.prefix = self.ann_values.prefix
-        self.suffix = self.ann_values.suffix
-        self.seyame = self.ann_values.seyame
-        self.postag = self.ann_values.grammatical_category
+    def __init__(self, text, row):
+        self._text = text
+        self._row = row
 
     def __repr__(self):
         return '<NTWord {0}: "{1}">'.format(self.get_loc_str(), self.cons_str)
@@ -105,65 +319,360 @@ class NTWord:
     def __str__(self):
         return self.cons_str
 
+    def __eq__(self, other):
+        return (isinstance(other, NTWord) and self._row == other._row
+                and self._text._forms is other._text._forms)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self._text._forms), self._row))
+
+    @property
+    def cons_str(self):
+        forms = self._text._forms
+        return self._text._transcriber.string(forms.types[forms.ids[self._row]])
+
+    @property
+    def location(self):
+        text, row = self._text, self._row
+        v = text._verse_ids[row]
+        return NTWord.Location(*text._verse_labels[v] +
+                               (row - text._verse_offsets[v] + 1,))
+
+    @property
+    def annotation(self):
+        return self._text._transcriber.annotation(self._row)[0]
+
+    @property
+    def ann_values(self):
+        return self._text._transcriber.annotation(self._row)[1]
+
+    # some shortcuts:
+    stem   = property(lambda self: self.ann_values.stem)
+    lexeme = property(lambda self: self.ann_values.lexeme)
+    root   = property(lambda self: self.ann_values.root)
+    prefix = property(lambda self: self.ann_values.prefix)
+    suffix = property(lambda self: self.ann_values.suffix)
+    seyame = property(lambda self: self.ann_values.seyame)
+    postag = property(lambda self: self.ann_values.grammatical_category)
+
     def get_loc_str(self):
         '''Combine location elements into fixed-length string'''
         return '{0:02}{1:02}{2:03}{3:02}'.format(*self.location[1:])
         # return get_loc_id(self.book_id, self.chapter, self.verse, self.w_num)
 
 
-class SyrNT:
+class Words(View):
+    '''View on words of a SyrNT text, see views.View'''
+
+    word_class = NTWord
+
+    def verses(self):
+        '''Get list of views on the consecutive words of every verse'''
+        import numpy as np
+        rows = np.fromiter(self.rows, dtype=np.int64, count=len(self))
+        if not len(rows):
+            return []
+        verse_ids = np.asarray(self.text._verse_ids)[rows]
+        # a new verse, or a gap in the rows, starts a new view
+        starts = np.flatnonzero((verse_ids[1:] != verse_ids[:-1]) |
+                                (rows[1:] != rows[:-1] + 1)) + 1
+        bounds = [0] + starts.tolist() + [len(rows)]
+        return [self[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+class StreamedVerse(object):
+    '''Words of one verse, parsed from a line of the Syromorph file'''
+
+    __slots__ = ('_forms', '_annotations', '_verse_labels', '_verse_offsets',
+                 '_verse_ids', '_transcriber')
+
+    def __init__(self, label, line, tr):
+        forms, annotations = [], []
+        for w_str in line.split():
+            cons_str, a_str = w_str.split('|')
+            forms.append(cons_str)
+            annotations.append(parse_annotation(a_str))
+        # nothing is shared with other verses, so memory stays constant
+        rows = range(len(forms))
+        self._forms = Types(forms, rows)
+        self._annotations = Types(annotations, rows)
+        self._verse_labels = [label]
+        self._verse_offsets = [0, len(forms)]
+        self._verse_ids = [0] * len(forms)
+        self._transcriber = Transcriber(tr, self._annotations)
 
-    def __init__(self, tr=towit):
-        self._nt_verses = self._nt_verses(tr)
-        self._nt_words = self._nt_words()
-        self._idx = 0
+    def __len__(self):
+        return len(self._forms)
+
+
+class SyrNT(References):
+
+    # attributes of the loaded text, see __getattr__()
+    _loaded = ('_forms', '_annotations', '_verse_labels', '_verse_offsets',
+               '_verse_ids', '_transcriber')
+
+    def __init__(self, tr=towit, source=None, path=None, stream=False,
+                 workers=1):
+        '''Load the Syromorph NT
+
+        The text is read from the Syromorph file at path (by default
+        from the config file), or else from a source, e.g.
+        sqlitedb.SQLiteSource. With stream=True, the file is not loaded:
+        verses(), words(), tag_sentences() and printlines() read it verse
+        by verse, and it is only loaded when other methods need it.
+        With workers > 1, the file is parsed in chunks by up to workers
+        processes at once (workers=None for one per CPU). As usual with
+        multiprocessing, a script doing so must guard its main code with
+        if __name__ == '__main__'.
+        '''
+        self._tr = tr
+        self._path = dbpath if path is None else path
+        self._source = source
+        self._stream = stream and source is None
+        self._workers = workers
+        self._transcribers = {}
+        self._references = None
+        self._line_offsets = None
+        self._packed = None
+        if not self._stream:
+            self._load()
+
+    def __getattr__(self, name):
+        # only called if name is not found, i.e. in streaming mode
+        # before the text is loaded
+        if name in SyrNT._loaded:
+            self._load()
+            return getattr(self, name)
+        raise AttributeError(name)
 
     def __getitem__(self, key):
-        return self._nt_words[key]
+        if isinstance(key, slice):
+            return Words(self, range(len(self))[key])
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        return NTWord(self, key)
 
     def __len__(self):
-        return len(self._nt_words)
+        return len(self._forms)
 
     def __iter__(self):
-        return self
-
-    def __next__(self):
+        # a new iterator every time, so that loops can be nested
+        return self.words()
+
+    def _load(self):
+        # the text is stored in SEDRA transcription, and rendered in
+        # transcription tr when words are accessed. Forms and annotations
+        # repeat a lot, so are stored as Types: every distinct value is
+        # parsed and stored only once.
+        self._verse_labels = []
+        self._verse_offsets = [0]
+        self._verse_ids = array('H')
+        if self._source is None:
+            self._read_db_file(self._path, self._workers)
+        else:
+            self._read_source(self._source)
+        self._transcriber = self._get_transcriber(self._tr)
+
+    def _streaming(self):
+        return self._stream and '_forms' not in self.__dict__
+
+    def _read_db_file(self, path, workers=1):
+        '''Parse the Syromorph file, in chunks in parallel processes
+
+        The file is split into chunks of whole lines, which are parsed
+        into columns with type ids of their own, and merged in order.
+        The verse labels follow from the numbers of lines of the chunks.
+        '''
+        if workers is None:
+            workers = os.cpu_count() or 1
+        bounds = chunk_bounds(path, workers) if workers > 1 else []
+        if len(bounds) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(len(bounds)) as pool:
+                chunks = list(pool.map(parse_chunk, [path] * len(bounds),
+                                       *zip(*bounds)))
+            chunk = label_verses(merge_chunks(chunks))
+        else:
+            chunk = parse_lines(read_db_file(path), get_verse_labels())
+        self._forms = Types(chunk.forms, chunk.form_ids)
+        self._annotations = Types(chunk.annotations, chunk.ann_ids)
+        self._verse_labels = chunk.verse_labels
+        self._verse_offsets = chunk.verse_offsets.tolist()
+        for v, (start, stop) in enumerate(zip(self._verse_offsets[:-1],
+                                              self._verse_offsets[1:])):
+            self._verse_ids.extend([v] * (stop - start))
+
+    def _read_source(self, source):
+        # forms and annotations may be any sequences, or Types, e.g. on
+        # the memory-mapped columns of an npzbundle.Bundle
+        forms, annotations, verse_labels, verse_offsets = source.read_syrnt()
+        self._forms = make_types(forms)
+        self._annotations = make_types(annotations)
+        self._verse_labels = list(verse_labels)
+        self._verse_offsets = list(verse_offsets)
+        for v, (start, stop) in enumerate(zip(verse_offsets[:-1],
+                                              verse_offsets[1:])):
+            self._verse_ids.extend([v] * (stop - start))
+
+    def _get_transcriber(self, tr):
         try:
-            item = self._nt_words[self._idx]
-        except IndexError:
-            self._idx = 0
-            raise StopIteration()
-        self._idx += 1
-        return item
-
-    next = __next__ # Python 2
-
-    def _nt_verses(self, tr):
-        nt_verses = []
-        for verse_label, line in zip(get_verse_labels(), read_db_file()):
-            verse = [NTWord(w_str, verse_label + (w_num,), tr)
-                     for w_num, w_str in enumerate(line.strip().split(), 1)]
-            nt_verses.append((verse_label, verse))
-        return nt_verses
-
-    def _nt_words(self):
-        return [w for l, v in self._nt_verses for w in v]
+            return self._transcribers[id(tr)]
+        except KeyError:
+            transcriber = self._transcribers[id(tr)] = Transcriber(
+                tr, self._annotations)
+            return transcriber
+
+    def transcribed(self, tr):
+        '''Get view on this text in transcription tr, sharing all data'''
+        other = SyrNT.__new__(SyrNT)
+        other.__dict__.update(self.__dict__)
+        other._tr = tr
+        if self._streaming():
+            # other loads its own text, if needed
+            other._transcribers = {}
+        else:
+            other._transcriber = self._get_transcriber(tr)
+        return other
+
+    @property
+    def verse_offsets(self):
+        '''Offsets of the first word of every verse, and of the end'''
+        return self._verse_offsets
+
+    def verse_label(self, i):
+        '''Get label (book_name, book_id, chapter, verse) of verse i'''
+        return self._verse_labels[i]
+
+    def column(self, name, coded=False):
+        '''Get list of values of cons_str or an annotation field of all
+        words, with coded=True as codes (from annotation) instead of labels'''
+        t = self._transcriber
+        if name == 'cons_str':
+            return self._forms.column(t.string)
+        i = NTWord.Annotation._fields.index(name)
+        labels = c.ANNOTATIONS[i][1]
+        if labels and not coded:
+            return self._annotations.column(lambda a: labels[a[i]])
+        return self._annotations.column(
+            lambda a: a[i] if isinstance(a[i], int) else t.string(a[i]))
+
+    def packed(self):
+        '''Get numpy array of the coded annotation fields of all words,
+        packed into one int64 per word (see Packing), which is built on
+        first request from the annotation types'''
+        if self._packed is None:
+            import numpy as np
+            pack = packing.pack
+            types = np.array([pack(a) for a in self._annotations.types],
+                             dtype=np.int64)
+            self._packed = types[np.asarray(self._annotations.ids)]
+        return self._packed
+
+    def codes(self, name):
+        '''Get numpy array of the codes of coded field name of all words'''
+        i, shift, mask, labels = packing.field(name)
+        return ((self.packed() >> shift) & mask).astype('uint8')
+
+    def labels(self, name, codes):
+        '''Get numpy array of the labels of field name of codes'''
+        import numpy as np
+        return np.array(packing.field(name)[3], dtype=object)[codes]
+
+    def mask(self, **conditions):
+        '''Get numpy array of bool, True for the words that match all
+        conditions on coded fields, given as labels or codes, or as a
+        list (or other iterable, e.g. an array) of them to match any, e.g.:
+        mask(grammatical_category='verb', person=['first', 'second'])
+        '''
+        import numpy as np
+        packed = self.packed()
+        bits = value = 0    # single values are matched all at once
+        result = None
+        for name, v in conditions.items():
+            i, shift, mask, labels = packing.field(name)
+            if not isinstance(v, (str, Integral)):
+                codes = [packing.code(name, x) for x in v]
+                m = np.isin((packed >> shift) & mask, codes)
+                result = m if result is None else result & m
+            else:
+                bits |= mask << shift
+                value |= packing.code(name, v) << shift
+        if bits or result is None:
+            m = (packed & bits) == value
+            result = m if result is None else result & m
+        return result
+
+    def filter(self, **conditions):
+        '''Get view on the words that match conditions, see mask()'''
+        import numpy as np
+        return Words(self, np.flatnonzero(self.mask(**conditions)))
 
     def verses(self, label=False):
-        for v in self._nt_verses:
-            yield v if label else v[1]
+        if self._streaming():
+            for v in self.stream_verses(label):
+                yield v
+            return
+        offsets = self._verse_offsets
+        for i, l in enumerate(self._verse_labels):
+            v = Words(self, range(offsets[i], offsets[i+1]))
+            yield (l, v) if label else v
+
+    def stream_verses(self, label=False, reference=None):
+        '''Read verses one by one from the Syromorph file
+
+        Unlike verses(), this does not load the whole text. With a
+        reference, e.g. 'John 3', only the verses of that passage are
+        read, starting at the byte offset of its first verse.
+        '''
+        labels = list(get_verse_labels())
+        start, stop = 0, len(labels)
+        if reference is not None:
+            # a reference index on verses, instead of words
+            index = ReferenceIndex([l[1:] for l in labels],
+                                   range(len(labels) + 1))
+            start, stop = index.span(reference)
+        with open(self._path, 'rb') as f:
+            if start:
+                f.seek(self.line_offsets()[start])
+            for l, line in zip(labels[start:stop], f):
+                verse = StreamedVerse(l, line.decode('utf-8'), self._tr)
+                v = Words(verse, range(len(verse)))
+                yield (l, v) if label else v
+
+    def line_offsets(self):
+        '''Get byte offsets of the lines (verses) of the Syromorph file,
+        and of the end, in an array that is built on first request'''
+        if self._line_offsets is None:
+            offsets = array('q', [0])
+            with open(self._path, 'rb') as f:
+                for line in f:
+                    offsets.append(offsets[-1] + len(line))
+            self._line_offsets = offsets
+        return self._line_offsets
 
     def words(self):
-        for w in self._nt_words:
-            yield w
+        if self._streaming():
+            for v in self.stream_verses():
+                for w in v:
+                    yield w
+            return
+        for row in range(len(self)):
+            yield NTWord(self, row)
 
     def tag_sentences(self, tag=postag):
         for s in self.verses():
             yield [(w.cons_str, tag(w)) for w in s]
 
-    def printlines(self):
+    def printlines(self, stream=False):
+        '''Yield lines of text, with stream=True without loading the text'''
+        verses = self.stream_verses if stream else self.verses
         pl = None # pl: previous label
-        for l, v in self.verses(label=True):
+        for l, v in verses(label=True):
             if pl is None or pl[1] != l[1] or pl[2] != l[2]:
                 if pl is not None:  # no newline before first chapter
                     yield ''
@@ -173,7 +682,7 @@ class SyrNT:
 
 
 def main():
-    for line in SyrNT(tosyr).printlines():
+    for line in SyrNT(tosyr, stream=True).printlines():
         print(line)
 
 def usage():
@@ -0,0 +1,639 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the loaders, exports, indexes and analyzer
+
+Run from the directory with linksyr.conf, like the modules themselves:
+
+    python -m unittest test_linksyr
+
+The SEDRA data are read from the configured datadir. Since the
+Syromorph file is not shipped, SyrNT is tested on a synthetic file in
+the same format (see benchmark.write_syromorph), in a temporary
+directory that also holds the exported files.
+"""
+
+from __future__ import unicode_literals, print_function
+import os
+import shutil
+import tempfile
+import unittest
+
+import sedra
+import syrnt
+import morphan
+import encoder
+import npzbundle
+import sqlitedb
+import references
+import concordance
+import query
+import alignment
+from benchmark import write_syromorph
+
+tmp_dir = None
+syromorph = None
+
+
+def setUpModule():
+    global tmp_dir, syromorph
+    tmp_dir = tempfile.mkdtemp()
+    syromorph = os.path.join(tmp_dir, 'all-ordered.txt')
+    write_syromorph(syromorph)
+
+def tearDownModule():
+    shutil.rmtree(tmp_dir)
+
+
+def syrnt_state(nt):
+    '''Get lines and annotations of all words of a SyrNT text'''
+    return list(nt.printlines()), [w.annotation for w in nt]
+
+def table_columns(db):
+    '''Get dict of lists of values of all columns of all SEDRA tables'''
+    classes = sedra.SedraIII.db_classes
+    return dict(((name, key), list(getattr(db.get_table(file_no), key)))
+                for file_no, (name, db_class) in enumerate(classes)
+                for key in db_class._columns)
+
+
+def cross_product_affixes(word, prefixes, suffixes):
+    '''Segmentations as found by testing every prefix and suffix'''
+    return set((p, word[len(p):len(word)-len(s)], s)
+               for s in suffixes if word.endswith(s)
+               for p in prefixes
+               if word.startswith(p) and len(word) > len(p + s))
+
+def scan_query(text, s):
+    '''Get matches of query s by trying every sequence of words'''
+    terms, gaps = query.parse_query(s)
+    fields = set(c.field for term in terms for c in term)
+    columns = dict((f, [str(v) for v in concordance.get_column(text, f)])
+                   for f in fields)
+    def test(term, p):
+        return all((columns[c.field][p] in c.values) != c.negated
+                   for c in term)
+    matches = []
+    offsets = text.verse_offsets
+    for start, stop in zip(offsets[:-1], offsets[1:]):
+        rows = [(p,) for p in range(start, stop) if test(terms[0], p)]
+        for term, (lo, hi) in zip(terms[1:], gaps):
+            rows = [r + (p,) for r in rows
+                    for p in range(r[-1] + lo, min(r[-1] + hi + 1, stop))
+                    if test(term, p)]
+        matches.extend(rows)
+    return matches
+
+def kwic_lines(text, forms, positions, width):
+    '''Get keyword-in-context lines of positions, in text order'''
+    lines = []
+    for p in positions:
+        label = text[p].location[:4]
+        verse = [i for i in range(p - width, p + width + 1)
+                 if 0 <= i < len(text) and text[i].location[:4] == label]
+        lines.append(concordance.Line(
+            p, '{0} {2}:{3}'.format(*label),
+            tuple(forms[i] for i in verse if i < p), forms[p],
+            tuple(forms[i] for i in verse if i > p)))
+    return lines
+
+def scan_alignment(nt, bfbs):
+    '''Get list of (loc_id, kind, syrnt, bfbs) by comparing all words'''
+    words = {}
+    for key, text in (('syrnt', nt), ('bfbs', bfbs)):
+        for w in text:
+            l = w.location
+            loc_id = ((l.book_id * 100 + l.chapter) * 1000 + l.verse) * 100 \
+                + l.w_num
+            words.setdefault(loc_id, {}).setdefault(key, []).append(w)
+    found = []
+    for loc_id in sorted(words):
+        a, b = words[loc_id].get('syrnt', []), words[loc_id].get('bfbs', [])
+        if not b:
+            found.append((loc_id, 'only_syrnt', a[0].cons_str, None))
+        elif not a:
+            found.append((loc_id, 'only_bfbs', None, b[0].cons_str))
+        else:
+            lexeme = b[0].lexeme.lex_str if b[0].lexeme else ''
+            if a[0].cons_str != b[0].cons_str:
+                found.append((loc_id, 'cons_str', a[0].cons_str,
+                              b[0].cons_str))
+            if a[0].ann_values.lexeme != lexeme:
+                found.append((loc_id, 'lexeme', a[0].ann_values.lexeme,
+                              lexeme))
+    return found
+
+
+class Tags:
+    # a tag function with the same name as syrnt.postag
+
+    @staticmethod
+    def postag(w):
+        return w.prefix or 'none'
+
+
+class ParallelParseTest(unittest.TestCase):
+
+    def test_syrnt_workers(self):
+        nt = syrnt.SyrNT(path=syromorph, workers=1)
+        expected = syrnt_state(nt)
+        for workers in (2, 3, 7):
+            other = syrnt.SyrNT(path=syromorph, workers=workers)
+            self.assertEqual(syrnt_state(other), expected)
+            # the same types, in the same order
+            self.assertEqual(other._annotations.types, nt._annotations.types)
+            self.assertEqual(list(other._forms.ids), list(nt._forms.ids))
+
+    def test_syrnt_small_files(self):
+        path = os.path.join(tmp_dir, 'small.txt')
+        with open(syromorph) as f:
+            lines = f.read().split('\n')
+        # empty, one line without newline, a few lines, and lines after
+        # the last verse, which are left out
+        for text in ('', lines[0], '\n'.join(lines[:5]) + '\n',
+                     '\n'.join(lines[:-1] + lines[:20]) + '\n'):
+            with open(path, 'w') as f:
+                f.write(text)
+            expected = syrnt_state(syrnt.SyrNT(path=path, workers=1))
+            for workers in (2, 7):
+                self.assertEqual(
+                    syrnt_state(syrnt.SyrNT(path=path, workers=workers)),
+                    expected)
+
+
+class ParallelLoadTest(unittest.TestCase):
+
+    def test_sedra_workers(self):
+        db = sedra.SedraIII(tr=None, cache=False, workers=1)
+        other = sedra.SedraIII(tr=None, cache=False, workers=2)
+        self.assertEqual(table_columns(other), table_columns(db))
+
+
+class StreamTest(unittest.TestCase):
+
+    def test_syrnt_stream(self):
+        nt = syrnt.SyrNT(path=syromorph, workers=1)
+        stream = syrnt.SyrNT(path=syromorph, stream=True)
+        self.assertEqual(list(stream.printlines()), list(nt.printlines()))
+        self.assertEqual([[w.cons_str for w in v]
+                          for v in stream.stream_verses(reference='John 3')],
+                         [[w.cons_str for w in v]
+                          for v in nt.passage('John 3').verses()])
+
+
+class SQLiteTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        nt = syrnt.SyrNT(path=syromorph, workers=1)
+        bfbs = sedra.BFBS(shared=False)
+        path = os.path.join(tmp_dir, 'linksyr.sqlite')
+        sqlitedb.export(path, bfbs=bfbs, syrnt_text=nt)
+        source = sqlitedb.SQLiteSource(path)
+        try:
+            db = sedra.SedraIII(source=source)
+            self.assertEqual(table_columns(db), table_columns(bfbs.db))
+            other = sedra.BFBS(source=source, shared=False)
+            self.assertEqual(list(other.printlines()), list(bfbs.printlines()))
+            self.assertEqual(syrnt_state(syrnt.SyrNT(source=source)),
+                             syrnt_state(nt))
+        finally:
+            source.close()
+
+
+class BundleTest(unittest.TestCase):
+
+    def test_syrnt(self):
+        nt = syrnt.SyrNT(path=syromorph, workers=1)
+        path = os.path.join(tmp_dir, 'syrnt.npz')
+        npzbundle.export_syrnt(path, nt)
+        self.assertEqual(syrnt_state(npzbundle.load_syrnt(path)),
+                         syrnt_state(nt))
+
+    def test_bfbs(self):
+        bfbs = sedra.BFBS(shared=False)
+        path = os.path.join(tmp_dir, 'bfbs.npz')
+        npzbundle.export_bfbs(path, bfbs)
+        nt = npzbundle.load_bfbs(path, db=bfbs.db)
+        for key in sedra.BFBS.column_names:
+            self.assertEqual(nt.columns[key].tolist(),
+                             bfbs.columns[key].tolist())
+        self.assertEqual(list(nt.printlines()), list(bfbs.printlines()))
+
+
+class TranscribedIndexTest(unittest.TestCase):
+
+    def test_string_index(self):
+        db = sedra.SedraIII(tr=None, lazy=True)
+        wit = db.transcribed(sedra.towit)
+        syr = db.transcribed(sedra.tosyr)
+        form = db.words[5].cons_str
+        expected = db.filter('words', 'cons_str', form)
+        self.assertTrue(expected)
+        for view in (wit, syr):
+            found = view.filter('words', 'cons_str', view.words[5].cons_str)
+            self.assertEqual([r.id for r in found], [r.id for r in expected])
+
+
+class AffixTest(unittest.TestCase):
+
+    def test_segmentations(self):
+        import random
+        rnd = random.Random(1)
+        prefixes = {'', 'D', 'DL', 'DB', 'B', 'WLD', 'W', 'WD', 'L', 'LD'}
+        suffixes = {'', 'J', 'H', 'HJ', 'WN', 'WHJ', 'N', 'NN', 'KWN', 'T'}
+        p_trie = morphan.AffixTrie(prefixes)
+        s_trie = morphan.AffixTrie(suffixes, reverse=True)
+        for i in range(2000):
+            word = ''.join(rnd.choice('DLBWJHNKT>')
+                           for _ in range(rnd.randrange(8)))
+            found = list(morphan.check_affixes(word, p_trie, s_trie))
+            self.assertEqual(len(found), len(set(found)))
+            self.assertEqual(set(found),
+                             cross_product_affixes(word, prefixes, suffixes))
+
+    def test_learned_affixes(self):
+        nt = syrnt.SyrNT(path=syromorph, workers=1)
+        words = list(nt.passage('Matt 1-5'))
+        ma = morphan.MorphAn()
+        ma.train(words)
+        self.assertEqual(ma.prefixes.affixes,
+                         set([''] + [w.prefix for w in words]))
+        self.assertEqual(ma.suffixes.affixes,
+                         set([''] + [w.suffix for w in words]))
+
+
+class EncoderCacheTest(unittest.TestCase):
+
+    def test_fingerprint(self):
+        nt = syrnt.SyrNT(path=syromorph, workers=1)
+        verses = list(nt.verses())
+        path = os.path.join(tmp_dir, 'train.npz')
+        for sentences in (nt, verses[:100], verses[100:200], nt[:500]):
+            cached = encoder.Encoder().encode(sentences, cache=path)
+            fresh = encoder.Encoder().encode(sentences)
+            self.assertEqual(cached.tokens.tolist(), fresh.tokens.tolist())
+            self.assertEqual(cached.lengths.tolist(), fresh.lengths.tolist())
+
+    def test_tag_function(self):
+        nt = syrnt.SyrNT(path=syromorph, workers=1)
+        path = os.path.join(tmp_dir, 'tags.npz')
+        for tag in (syrnt.postag, Tags.postag, syrnt.supertag):
+            cached = encoder.Encoder(tag=tag).encode(nt[:300], cache=path)
+            fresh = encoder.Encoder(tag=tag).encode(nt[:300])
+            self.assertEqual(cached.tags.strings, fresh.tags.strings)
+            self.assertEqual(cached.tag_ids.tolist(), fresh.tag_ids.tolist())
+        def local_tag(w):
+            return w.postag
+        for tag in (lambda w: w.postag, local_tag):
+            self.assertRaises(ValueError, encoder.Encoder(tag=tag).encode,
+                              nt[:300], cache=path)
+            # without cache, any function will do
+            encoder.Encoder(tag=tag).encode(nt[:300])
+
+
+class ReferenceTest(unittest.TestCase):
+
+    def test_parse(self):
+        parse = references.parse_reference
+        john, rom, jude = 55, 57, 77
+        self.assertEqual(parse('John 3:16'), ((john, 3, 16), (john, 3, 16)))
+        self.assertEqual(parse('john 1-3'), ((john, 1, None), (john, 3, None)))
+        self.assertEqual(parse('Rom 8:28-39'), ((rom, 8, 28), (rom, 8, 39)))
+        self.assertEqual(parse('Rom 8:28-9:5'), ((rom, 8, 28), (rom, 9, 5)))
+        self.assertEqual(parse('Rom 8.28'), ((rom, 8, 28), (rom, 8, 28)))
+        self.assertEqual(parse('Jude'), ((jude, None, None),) * 2)
+        self.assertEqual(parse('Matt 28:16-Mark 1:8'),
+                         ((52, 28, 16), (53, 1, 8)))
+        for s in ('Matt 5:', 'John 3-', 'Foo 1:1', '1:1'):
+            self.assertRaises((ValueError, KeyError), parse, s)
+
+    def test_single_chapter_books(self):
+        parse = references.parse_reference
+        self.assertEqual(parse('Jude 5'), ((77, 1, 5), (77, 1, 5)))
+        self.assertEqual(parse('Jude 3-5'), ((77, 1, 3), (77, 1, 5)))
+        self.assertEqual(parse('Jude 1:3-5'), ((77, 1, 3), (77, 1, 5)))
+        self.assertEqual(parse('3John 2'), ((76, 1, 2), (76, 1, 2)))
+        self.assertEqual(parse('Heb 13:25-Jude 2'), ((70, 13, 25), (77, 1, 2)))
+
+    def test_index(self):
+        # two books of two chapters, with two verses of two words each
+        labels = [(55, c, v) for c in (1, 2) for v in (1, 2)] + \
+                 [(56, c, v) for c in (1, 2) for v in (1, 2)]
+        index = references.ReferenceIndex(labels, range(0, 17, 2))
+        self.assertEqual(index.span('John'), (0, 8))
+        self.assertEqual(index.span('John', 2), (4, 8))
+        self.assertEqual(index.span('Acts', 1, 2), (10, 12))
+        self.assertEqual(index.span('John 1:2-Acts 1:1'), (2, 10))
+        self.assertEqual(index.span(56), (8, 16))
+        self.assertRaises(KeyError, index.span, 'John 3')
+        self.assertRaises(ValueError, index.span, 'John 2-1')
+
+    def test_text(self):
+        nt = syrnt.SyrNT(path=syromorph, workers=1)
+        passage = nt.passage('Jude 5')
+        self.assertEqual(set(w.location[:4] for w in passage),
+                         set([('Jude', 77, 1, 5)]))
+        self.assertEqual(list(nt.verse('Jude', 1, 5)), list(passage))
+        self.assertEqual(len(nt.chapter('John', 3)), len(nt.passage('John 3')))
+        self.assertEqual(len(nt.book('Jude')), len(nt.passage('Jude 1-25')))
+        both = nt.select('Jude', 'John 3:16')
+        self.assertEqual(len(both), len(nt.book('Jude')) +
+                         len(nt.verse('John', 3, 16)))
+
+
+class PackedAnnotationTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.nt = syrnt.SyrNT(path=syromorph, workers=1)
+
+    def test_codes(self):
+        nt = self.nt
+        for name in syrnt.packing.fields:
+            codes = nt.codes(name)
+            self.assertEqual(codes.tolist(), nt.column(name, coded=True))
+            self.assertEqual(nt.labels(name, codes[:100]).tolist(),
+                             nt.column(name)[:100])
+
+    def test_mask(self):
+        nt = self.nt
+        words = list(nt)
+        def scan(test):
+            return [test(w.ann_values) for w in words]
+        self.assertEqual(
+            nt.mask(grammatical_category='verb', number='plural').tolist(),
+            scan(lambda a: a.grammatical_category == 'verb'
+                 and a.number == 'plural'))
+        self.assertEqual(
+            nt.mask(aspect=['perfect', 2], person='first').tolist(),
+            scan(lambda a: a.aspect in ('perfect', 'imperfect')
+                 and a.person == 'first'))
+        self.assertEqual(nt.mask().tolist(), [True] * len(nt))
+        # codes as given by codes(), also numpy integers and arrays
+        codes = nt.codes('aspect')
+        self.assertEqual(nt.mask(aspect=codes[0]).tolist(),
+                         (codes == codes[0]).tolist())
+        self.assertEqual(nt.mask(aspect=codes[:2]).tolist(),
+                         ((codes == codes[0]) | (codes == codes[1])).tolist())
+        for conditions in ({'lexeme': 'MLK>'}, {'aspect': 'unknown'},
+                           {'aspect': 6}, {'aspect': True}):
+            self.assertRaises(ValueError, nt.mask, **conditions)
+
+    def test_filter(self):
+        nt = self.nt
+        view = nt.filter(grammatical_category='noun', state='emphatic')
+        self.assertEqual(
+            [w.location for w in view],
+            [w.location for w in nt if w.postag == 'noun'
+             and w.ann_values.state == 'emphatic'])
+
+
+class QueryTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.nt = syrnt.SyrNT(path=syromorph, workers=1)
+        cls.query = query.Query(cls.nt)
+
+    def test_scan(self):
+        # the planner starts from the first, middle or last term
+        for s in ('[grammatical_category=verb] <3 [number=plural]',
+                  '[prefix=D] .. [aspect!=perfect, person=first]',
+                  '[lexeme=HW>] [] [grammatical_category=noun|adjective]',
+                  '[number=plural] <2 [state=emphatic] [lexeme=MN|L]',
+                  '[state=absolute] [lexeme=MN] .. [gender!=feminine]'):
+            positions = [tuple(r) for r in self.query.positions(s).tolist()]
+            self.assertEqual(positions, scan_query(self.nt, s), s)
+            self.assertEqual(self.query.count(s), len(positions))
+
+    def test_run(self):
+        matches = list(self.query.run('[prefix=D] [lexeme=HW>]'))
+        for m in matches:
+            self.assertEqual([w.location for w in m.words],
+                             [self.nt[p].location for p in m.positions])
+            self.assertEqual(m.label, self.nt[m.positions[0]].location[:4])
+            self.assertEqual(m.words[0].prefix, 'D')
+
+    def test_case(self):
+        q = self.query
+        n = q.count('[lexeme=HW>]')
+        self.assertTrue(n > 0)
+        self.assertEqual(q.count('[LEXEME=HW>]'), n)
+        self.assertEqual(q.count('[lexeme=hw>]'), 0)
+        self.assertEqual(q.count('[aspect=Perfect]'), 0)
+        self.assertRaises(KeyError, q.count, '[lemma=HW>]')
+        for s in ('', '<3 [lexeme=HW>]', '[lexeme=HW>] ..', '[] <3 .. []',
+                  '[lexeme]'):
+            self.assertRaises(ValueError, q.count, s)
+
+
+class ConcordanceTest(unittest.TestCase):
+
+    def test_postings(self):
+        nt = syrnt.SyrNT(path=syromorph, workers=1)
+        conc = concordance.Concordance(nt)
+        lexemes = [w.ann_values.lexeme or None for w in nt]
+        for lexeme in ('HW>', 'MN', 'MLK>'):
+            self.assertEqual(conc.postings('lexeme', lexeme).tolist(),
+                             [i for i, l in enumerate(lexemes) if l == lexeme])
+        self.assertEqual(conc.headwords('lexeme'),
+                         sorted(set(lexemes) - set([None])))
+        counts = [n for v, n in conc.frequencies('lexeme')]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertEqual(sum(counts), len(lexemes) - lexemes.count(None))
+
+    def test_kwic(self):
+        nt = syrnt.SyrNT(path=syromorph, workers=1)
+        conc = concordance.Concordance(nt)
+        forms = [w.cons_str or None for w in nt]
+        lines = kwic_lines(nt, forms, conc.postings('lexeme', 'HW>'), 3)
+        keys = {'position': lambda l: l.position,
+                'left': lambda l: (l.left[::-1], l.position),
+                'right': lambda l: (l.right, l.position),
+                'keyword': lambda l: (l.keyword, l.position)}
+        for sort in concordance.SORT_ORDERS:
+            self.assertEqual(list(conc.kwic('lexeme', 'HW>', width=3,
+                                            sort=sort)),
+                             sorted(lines, key=keys[sort]), sort)
+        # all headwords, in the order of headwords()
+        keywords = [line.position for line in conc.kwic('prefix', width=0)]
+        self.assertEqual(keywords, [p for v in conc.headwords('prefix')
+                                    for p in conc.postings('prefix', v)])
+        self.assertRaises(ValueError, list, conc.kwic('lexeme', 'HW>',
+                                                      sort='lexeme'))
+
+    def test_records(self):
+        # >B> is the string of more than one lexeme record
+        bfbs = sedra.BFBS(shared=False)
+        conc = concordance.Concordance(bfbs)
+        records = conc.records('lexeme', '>B>')
+        self.assertTrue(len(records) > 1)
+        positions = [i for i, w in enumerate(bfbs)
+                     if w.lexeme is not None and str(w.lexeme) == '>B>']
+        self.assertEqual(conc.postings('lexeme', '>B>').tolist(), positions)
+        self.assertEqual(sorted(p for r in records
+                                for p in conc.postings('lexeme', r).tolist()),
+                         positions)
+        self.assertEqual(conc.count('lexeme', '>B>'), len(positions))
+        self.assertEqual([str(r) for r in conc.headwords('lexeme')],
+                         sorted(str(r) for r in conc.headwords('lexeme')))
+
+
+class AlignmentTest(unittest.TestCase):
+
+    def test_discrepancies(self):
+        with open(syromorph) as f:
+            lines = [line.split() for line in f]
+        # Matt 1:1 a different form and lexeme, Matt 1:2 a word less and
+        # Matt 1:3 a word more
+        form, annotation = lines[0][0].split('|')
+        lines[0][0] = '{0}{1}|{2}'.format(form, form[-1], annotation)
+        form, annotation = lines[0][1].split('|')
+        fields = annotation.split('#')
+        fields[1] += fields[1][-1]
+        lines[0][1] = '{0}|{1}'.format(form, '#'.join(fields))
+        del lines[1][-1]
+        lines[2].append(lines[2][0])
+        path = os.path.join(tmp_dir, 'aligned.txt')
+        with open(path, 'w') as f:
+            f.write('\n'.join(' '.join(line) for line in lines) + '\n')
+        nt = syrnt.SyrNT(path=path, workers=1).transcribed(None)
+        bfbs = sedra.BFBS(tr=None, shared=False)
+        a = alignment.Alignment(nt, bfbs)
+        found = a.discrepancies()
+        self.assertEqual([tuple(d) for d in found], scan_alignment(nt, bfbs))
+        kinds = dict(((d.loc_id, d.kind), d) for d in found)
+        for key in ((520100101, 'cons_str'), (520100102, 'lexeme'),
+                    (520100200 + len(lines[1]) + 1, 'only_bfbs'),
+                    (520100300 + len(lines[2]), 'only_syrnt')):
+            self.assertTrue(key in kinds, key)
+        summary = a.summary()
+        self.assertEqual(list(summary), list(alignment.KINDS))
+        for kind in alignment.KINDS:
+            self.assertEqual(summary[kind],
+                             len([d for d in found if d.kind == kind]))
+        self.assertEqual(a.report()['aligned_tokens'],
+                         len(nt) - summary['only_syrnt'])
+
+    def test_merged(self):
+        nt = syrnt.SyrNT(path=syromorph, workers=1)
+        bfbs = sedra.BFBS(shared=False)
+        a = alignment.Alignment(nt, bfbs)
+        table = a.merged()
+        self.assertEqual(table['loc_id'].tolist(),
+                         sorted(set(a.syrnt_loc_ids) | set(a.bfbs_loc_ids)))
+        for key, loc_ids in (('syrnt_row', a.syrnt_loc_ids),
+                             ('bfbs_row', a.bfbs_loc_ids)):
+            rows = table[key]
+            self.assertEqual(sorted(rows[rows >= 0].tolist()),
+                             list(range(len(loc_ids))))
+            self.assertTrue((loc_ids[rows[rows >= 0]] ==
+                             table['loc_id'][rows >= 0]).all())
+        self.assertEqual(alignment.duplicates([3, 1, 2, 3, 1, 3]).tolist(),
+                         [1, 3])
+
+
+class RegistryTest(unittest.TestCase):
+
+    def test_use_counts(self):
+        registry = sedra.Registry()
+        db = registry.get(tr=None)
+        self.assertTrue(registry.get(tr=None, db_dir=sedra.DB_DIR + '/') is db)
+        view = registry.get()
+        self.assertTrue(registry.get() is view)
+        self.assertFalse(view is db)
+        self.assertEqual(len(registry), 2)
+        registry.release(db)
+        self.assertTrue(db in registry)
+        registry.release(db)
+        self.assertFalse(db in registry)
+        self.assertRaises(KeyError, registry.release, db)
+        # the view keeps the database in SEDRA transcription
+        self.assertTrue(registry.get(tr=None) is db)
+        registry.release(db)
+        registry.release(view)
+        registry.release(view)
+        self.assertEqual(len(registry), 0)
+        self.assertFalse(registry.get(tr=None) is db)
+
+    def test_clear(self):
+        registry = sedra.Registry()
+        db = registry.get(tr=None)
+        registry.get()
+        registry.clear()
+        self.assertEqual(len(registry), 0)
+        self.assertFalse(db in registry)
+        self.assertFalse(registry.get(tr=None) is db)
+
+    def test_bfbs(self):
+        first, second = sedra.BFBS(), sedra.BFBS()
+        db = first.db
+        self.assertTrue(second.db is db)
+        self.assertTrue(db in sedra.registry)
+        first.close()
+        first.close()
+        self.assertTrue(db in sedra.registry)
+        second.close()
+        self.assertFalse(db in sedra.registry)
+        self.assertFalse(sedra.BFBS(shared=False).db in sedra.registry)
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db_dir = tempfile.mkdtemp(dir=tmp_dir)
+
+    def test_signature(self):
+        source = os.path.join(self.db_dir, 'source.txt')
+        path = os.path.join(self.db_dir, 'source.snapshot')
+        with open(source, 'w') as f:
+            f.write('air')
+        sedra.write_snapshot(path, self.db_dir, ['source.txt'], (1, 'a'))
+        read = lambda: sedra.read_snapshot(path, self.db_dir, ['source.txt'])
+        self.assertEqual(read(), (1, 'a'))
+        # touched, but not changed
+        st = os.stat(source)
+        os.utime(source, (st.st_atime, st.st_mtime + 10))
+        self.assertEqual(read(), (1, 'a'))
+        # changed, with the same size
+        with open(source, 'w') as f:
+            f.write('sky')
+        os.utime(source, (st.st_atime, st.st_mtime + 20))
+        self.assertEqual(read(), None)
+        sedra.write_snapshot(path, self.db_dir, ['source.txt'], (1, 'a'))
+        # changed, with the same modification time
+        with open(source, 'w') as f:
+            f.write('land')
+        os.utime(source, (st.st_atime, st.st_mtime + 20))
+        self.assertEqual(read(), None)
+        self.assertEqual(sedra.read_snapshot(path, self.db_dir, ['other.txt']),
+                         None)
+        with open(path, 'r+b') as f:
+            f.write(b'X')
+        self.assertEqual(read(), None)
+
+    def test_sedra(self):
+        for name in sedra.SedraIII.files:
+            shutil.copy(os.path.join(sedra.DB_DIR, sedra.CFG_ITEMS[name]),
+                        self.db_dir)
+        db = sedra.SedraIII(tr=None, db_dir=self.db_dir)
+        self.assertEqual(db.english[0].meaning, 'air')
+        for name in sedra.SedraIII.files:
+            self.assertTrue(os.path.exists(
+                sedra.snapshot_path(name, self.db_dir)))
+        path = os.path.join(self.db_dir, sedra.CFG_ITEMS['english'])
+        with open(path) as f:
+            text = f.read()
+        st = os.stat(path)
+        with open(path, 'w') as f:
+            f.write(text.replace('"air"', '"sky"', 1))
+        os.utime(path, (st.st_atime, st.st_mtime + 10))
+        db = sedra.SedraIII(tr=None, db_dir=self.db_dir)
+        self.assertEqual(db.english[0].meaning, 'sky')
+        # and a new snapshot is written
+        self.assertNotEqual(sedra.read_snapshot(
+            sedra.snapshot_path('english', self.db_dir), self.db_dir,
+            [sedra.CFG_ITEMS['english']]), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Zero-copy views on the words of a text
+
+A View holds a text and the row numbers of some of its words, as a list
+of parts (ranges, or arrays for arbitrary selections). Slicing and
+concatenating views only combine parts, so no words are copied:
+
+    train = nt[:50000] + nt[60000:]     # views on a syrnt.SyrNT
+    test = nt[50000:60000]
+    for train, test in nt[:].folds(10): # 10-fold cross-validation
+        ...
+
+Every iteration over a view is independent, so views can be iterated
+in nested loops or by several consumers at once.
+"""
+
+from __future__ import unicode_literals, print_function
+from bisect import bisect_right
+from itertools import chain
+
+
+class Rows(object):
+    '''Sequence of row numbers, made of parts (ranges or arrays)'''
+
+    __slots__ = ('parts', 'offsets')
+
+    def __init__(self, parts):
+        self.parts = [p for p in parts if len(p)]
+        # offset of every part in the sequence, and of the end
+        self.offsets = [0]
+        for p in self.parts:
+            self.offsets.append(self.offsets[-1] + len(p))
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return Rows([[self[i] for i in range(start, stop, step)]])
+            parts = []
+            for p, offset in zip(self.parts, self.offsets):
+                a, b = max(start - offset, 0), min(stop - offset, len(p))
+                if a < b:
+                    parts.append(p[a:b])    # a view for ranges and numpy
+            return Rows(parts)
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        i = bisect_right(self.offsets, key) - 1 if len(self.parts) > 1 else 0
+        return int(self.parts[i][key - self.offsets[i]])
+
+    def __iter__(self):
+        # arrays are iterated as lists, to get int row numbers
+        return chain.from_iterable(p.tolist() if hasattr(p, 'tolist') else p
+                                   for p in self.parts)
+
+    def __add__(self, other):
+        return Rows(self.parts + other.parts)
+
+    def __repr__(self):
+        return ','.join('{0}:{1}'.format(p.start, p.stop)
+                        if isinstance(p, range) and p.step == 1
+                        else '[{0}]'.format(len(p)) for p in self.parts)
+
+
+class View(object):
+    '''View on words of a text, by row number'''
+
+    word_class = None   # class of words, taking text and row number
+
+    def __init__(self, text, rows):
+        self.text = text
+        self.rows = rows if isinstance(rows, Rows) else Rows([rows])
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.__class__(self.text, self.rows[key])
+        return self.word_class(self.text, self.rows[key])
+
+    def __iter__(self):
+        text, word_class = self.text, self.word_class
+        return (word_class(text, row) for row in self.rows)
+
+    def __add__(self, other):
+        if not isinstance(other, View):
+            return NotImplemented
+        if other.text is not self.text:
+            raise ValueError('Cannot concatenate views on different texts')
+        return self.__class__(self.text, self.rows + other.rows)
+
+    def __repr__(self):
+        return '<{0}.{1} {2}>'.format(self.__module__,
+            self.__class__.__name__, self.rows)
+
+    def folds(self, k):
+        '''Yield k pairs of (train, test) views for cross-validation,
+        with the test views as k consecutive parts of this view'''
+        n = len(self)
+        for i in range(k):
+            start, stop = i * n // k, (i + 1) * n // k
+            yield self[:start] + self[stop:], self[start:stop]